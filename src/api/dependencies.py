@@ -0,0 +1,36 @@
+"""Shared FastAPI dependencies."""
+
+import asyncio
+from typing import Optional
+
+from fastapi import Request
+
+from src.services.cache import SlotCache
+from src.services.srcei.client import SharedBrowser
+from src.services.srcei.session import SessionStore
+
+
+def get_browser(request: Request) -> Optional[SharedBrowser]:
+    """Get the shared Playwright browser (launched on first use), if any."""
+    return getattr(request.app.state, "browser", None)
+
+
+def get_context_limit(request: Request) -> Optional[asyncio.Semaphore]:
+    """Get the semaphore capping concurrent contexts in the shared browser, if any."""
+    return getattr(request.app.state, "context_limit", None)
+
+
+def get_scrape_limit(request: Request) -> Optional[asyncio.Semaphore]:
+    """Get the semaphore capping concurrent /slots scrapes, if any."""
+    return getattr(request.app.state, "scrape_limit", None)
+
+
+def get_slot_cache(request: Request) -> Optional[SlotCache]:
+    """Get the slot response cache, or None if Redis is not configured."""
+    redis = getattr(request.app.state, "redis", None)
+    return SlotCache(redis) if redis is not None else None
+
+
+def get_session_store(request: Request) -> Optional[SessionStore]:
+    """Get the store for the authenticated SRCEI browser session, if any."""
+    return getattr(request.app.state, "session_store", None)
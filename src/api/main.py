@@ -1,13 +1,21 @@
 """Main FastAPI application."""
 
+import asyncio
 import logging
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import make_asgi_app
+from redis.asyncio import Redis
 
+from src.api.middleware.profiling import profile_request
 from src.api.routers.slots import router as slots_router
+from src.services.settings import get_server_settings, get_settings
+from src.services.srcei._playwright_patch import disable_stack_capture
+from src.services.srcei.client import SharedBrowser
+from src.services.srcei.session import SessionStore
 
 # Configure logging
 logging.basicConfig(
@@ -19,20 +27,37 @@ logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
-async def lifespan(_app: FastAPI) -> AsyncGenerator[None, None]:
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """
     Lifespan context manager for FastAPI application.
 
-    Handles startup and shutdown operations.
+    Handles startup and shutdown operations. A single Playwright browser is
+    shared for the process lifetime, launched by the first scrape that needs
+    it; each scrape opens its own context.
     """
     # Startup
     logger.info("🚀 Starting horas-registro-civil API")
-    logger.info("Real-time Playwright scraping enabled")
+    settings = get_settings()
+
+    if not settings.pw_inspect_stack:
+        disable_stack_capture()
+
+    app.state.browser = SharedBrowser(headless=True)
+    app.state.context_limit = asyncio.Semaphore(settings.max_browser_contexts)
+    app.state.scrape_limit = asyncio.Semaphore(settings.max_concurrent_scrapes)
+    app.state.session_store = SessionStore()
+
+    app.state.redis = Redis.from_url(settings.redis_url) if settings.redis_url else None
+    if app.state.redis is not None:
+        logger.info("Redis slot cache enabled")
 
     yield
 
     # Shutdown
     logger.info("Shutting down API")
+    await app.state.browser.close()
+    if app.state.redis is not None:
+        await app.state.redis.aclose()
 
 
 app = FastAPI(
@@ -47,13 +72,20 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=False,
-    allow_methods=["GET"],
+    allow_methods=["GET", "POST"],
     allow_headers=["*"],
 )
 
+# Profiling middleware - only registered with PROFILING_ENABLED outside production
+if get_server_settings().profiling_active:
+    app.middleware("http")(profile_request)
+
 # Include routers
 app.include_router(slots_router)
 
+# Prometheus metrics
+app.mount("/metrics", make_asgi_app())
+
 
 @app.get("/")
 def read_root() -> dict:
@@ -64,6 +96,8 @@ def read_root() -> dict:
         "version": "0.1.0",
         "endpoints": {
             "slots": "GET /slots?procedure_id=6&region_id=13",
+            "slots_batch": "POST /slots/batch",
+            "metrics": "GET /metrics",
             "docs": "GET /docs",
         },
     }
@@ -0,0 +1,7 @@
+"""Prometheus metrics exported at /metrics."""
+
+from prometheus_client import Gauge
+
+INFLIGHT_SCRAPES = Gauge(
+    "inflight_scrapes", "SRCEI scrapes currently running (a /slots/batch call counts once)"
+)
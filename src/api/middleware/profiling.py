@@ -0,0 +1,41 @@
+"""Opt-in request profiling middleware."""
+
+import logging
+from collections.abc import Awaitable, Callable
+
+from fastapi import Request, Response
+from fastapi.responses import HTMLResponse
+
+logger = logging.getLogger(__name__)
+
+
+async def profile_request(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    """
+    Profile a request with pyinstrument when called with `?profile=1`.
+
+    Only registered when PROFILING_ENABLED is set and ENVIRONMENT is not
+    "production". The profiled request runs normally, including its whole
+    response body, but the response is replaced by pyinstrument's HTML report.
+    """
+    if not request.query_params.get("profile"):
+        return await call_next(request)
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("Profiling requested but pyinstrument is not installed")
+        return await call_next(request)
+
+    profiler = Profiler(async_mode="enabled", interval=0.001)
+    profiler.start()
+    try:
+        response = await call_next(request)
+        # Drain the body so streaming responses are profiled to the end, not just their headers
+        async for _ in response.body_iterator:
+            pass
+    finally:
+        profiler.stop()
+
+    return HTMLResponse(profiler.output_html())
@@ -0,0 +1,49 @@
+"""Custom response classes."""
+
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to JSON bytes with orjson (UTC datetimes end in "Z")."""
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response serialized with orjson (native datetime support, in C)."""
+
+    def render(self, content: Any) -> bytes:
+        """Serialize content to JSON bytes."""
+        return dumps(content)
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that runs a cleanup callback however the response ends.
+
+    A body generator's own finally block does not run if the client goes away
+    before streaming starts; this callback always does.
+    """
+
+    def __init__(self, content: Any, on_close: Callable[[], Awaitable[None]], **kwargs: Any):
+        """
+        Initialize streaming response.
+
+        Args:
+            content: Body iterator
+            on_close: Coroutine function called once the response is done
+            **kwargs: Passed to StreamingResponse
+        """
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Send the response, then run the cleanup callback."""
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
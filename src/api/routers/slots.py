@@ -1,45 +1,211 @@
 """Slots API router."""
 
+import asyncio
 import logging
-from datetime import datetime
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
-from src.schemas.slots import SlotListResponse, SlotResponse
+from src.api.dependencies import (
+    get_browser,
+    get_context_limit,
+    get_scrape_limit,
+    get_session_store,
+    get_slot_cache,
+)
+from src.api.metrics import INFLIGHT_SCRAPES
+from src.api.responses import ClosingStreamingResponse, ORJSONResponse, dumps
+from src.schemas.slots import (
+    PROCEDURE_ID_PATTERN,
+    REGION_ID_PATTERN,
+    SlotBatchResponse,
+    SlotListResponse,
+    SlotQuery,
+)
+from src.services.cache import SlotCache
 from src.services.settings import Settings, get_settings
-from src.services.srcei.client import SRCEIPlaywrightClient
+from src.services.srcei.client import SharedBrowser
 from src.services.srcei.config import SRCEIConfig
-from src.services.srcei.recommender import format_slot_datetime_iso, sort_slots_by_datetime
+from src.services.srcei.exceptions import SRCEIAuthenticationError
+from src.services.srcei.recommender import format_slot_datetime_iso, sort_slots_with_iso
+from src.services.srcei.scraper import iter_slots, scrape_many, scrape_slots
+from src.services.srcei.session import SessionStore
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/slots", tags=["slots"])
 
+# Seconds to wait for another request's in-flight scrape before scraping ourselves
+CACHE_LOCK_WAIT = 30
+
+# Seconds to queue for a scrape slot before falling back to a stale cached response
+SCRAPE_QUEUE_WAIT = 2
+
+
+def _cached_response(value: bytes, cache_status: str, max_age: int) -> Response:
+    """Build a JSON response from a serialized slot list, with cache headers."""
+    return Response(
+        content=value,
+        media_type="application/json",
+        headers={"X-Cache": cache_status, "Cache-Control": f"public, max-age={max_age}"},
+    )
+
+
+def _slot_row(slot: dict, datetime_iso: str) -> dict:
+    """Map a raw SRCEI slot to the SlotResponse shape."""
+    return {
+        "office_name": slot["nombreOficina"],
+        "office_address": slot["direccionOficina"],
+        "date": slot["fechaDisponible"],
+        "time": slot["horaDisponible"],
+        "datetime_iso": datetime_iso,
+        "office_id": slot.get("idOficina", ""),
+    }
+
+
+def _build_slot_rows(raw_slots: list[dict]) -> list[dict]:
+    """
+    Sort raw SRCEI slots by datetime and convert them to SlotResponse-shaped dicts.
+
+    Rows come from our own scraper and go straight to JSON, so they are not
+    validated through the Pydantic models; the models document the shape.
+    """
+    # Sort slots by datetime, parsing each date once
+    return [_slot_row(slot, datetime_iso) for datetime_iso, slot in sort_slots_with_iso(raw_slots)]
+
+
+async def _acquire_scrape_slot(scrape_limit: asyncio.Semaphore, timeout: float) -> bool:
+    """Acquire a scrape slot, giving up after timeout seconds. Returns True if acquired."""
+    try:
+        await asyncio.wait_for(scrape_limit.acquire(), timeout=timeout)
+    except TimeoutError:
+        return False
+    return True
+
+
+@asynccontextmanager
+async def _scrape_slot(scrape_limit: Optional[asyncio.Semaphore]) -> AsyncGenerator[None, None]:
+    """Hold a scrape slot, waiting as long as needed, and count the scrape as in flight."""
+    async with scrape_limit or nullcontext():
+        INFLIGHT_SCRAPES.inc()
+        try:
+            yield
+        finally:
+            INFLIGHT_SCRAPES.dec()
+
+
+async def _scrape_slot_list(
+    procedure_id: str,
+    region_id: str,
+    settings: Settings,
+    browser: Optional[SharedBrowser],
+    context_limit: Optional[asyncio.Semaphore],
+    session_store: Optional[SessionStore],
+) -> dict:
+    """
+    Scrape SRCEI and build the SlotListResponse-shaped payload.
+
+    Raises:
+        HTTPException: 503 if authentication fails, 500 for unexpected errors
+    """
+    logger.info(f"Fetching slots for procedure={procedure_id}, region={region_id}")
+    scraped_at = datetime.now(timezone.utc)
+
+    INFLIGHT_SCRAPES.inc()
+    try:
+        # Create SRCEI config from settings
+        config = SRCEIConfig(
+            rut=settings.srcei_rut,
+            password=settings.srcei_password,
+        )
+
+        # Get slots
+        try:
+            raw_slots = await scrape_slots(
+                config,
+                procedure_id,
+                region_id,
+                client_type=settings.srcei_client,
+                browser=browser,
+                context_limit=context_limit,
+                session_store=session_store,
+            )
+        except SRCEIAuthenticationError:
+            logger.error("Login failed")
+            raise HTTPException(status_code=503, detail="Failed to authenticate with SRCEI")
+
+        if raw_slots:
+            slot_rows = _build_slot_rows(raw_slots)
+            logger.info(f"Successfully retrieved {len(slot_rows)} slots")
+        else:
+            slot_rows = []
+            logger.info("No slots found")
+
+        return {
+            "slots": slot_rows,
+            "count": len(slot_rows),
+            "procedure_id": procedure_id,
+            "region_id": region_id,
+            "scraped_at": scraped_at,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching slots: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        INFLIGHT_SCRAPES.dec()
+
 
 @router.get("", response_model=SlotListResponse)
 async def get_slots(
     procedure_id: str = Query(
         ...,
-        pattern="^(6|9|10|11|12|13|14|15)$",
+        pattern=PROCEDURE_ID_PATTERN,
         description="Procedure ID (6=Renovación, 9=Reimpresión, 10=Extranjero, 11=Pasaporte, 12=Menores, 13=Apostilla, 14=Rectificaciones, 15=Vehículos)",
     ),
     region_id: str = Query(
         ...,
-        pattern="^(1[0-6]|[1-9])$",
+        pattern=REGION_ID_PATTERN,
         description="Region ID (1-16)",
     ),
     settings: Settings = Depends(get_settings),
-) -> SlotListResponse:
+    browser: Optional[SharedBrowser] = Depends(get_browser),
+    context_limit: Optional[asyncio.Semaphore] = Depends(get_context_limit),
+    session_store: Optional[SessionStore] = Depends(get_session_store),
+    scrape_limit: Optional[asyncio.Semaphore] = Depends(get_scrape_limit),
+    cache: Optional[SlotCache] = Depends(get_slot_cache),
+) -> Response:
     """
     Get available appointment slots for a procedure and region.
 
-    This endpoint performs real-time scraping using Playwright, so response times
-    will be 10-30 seconds. Slots are sorted by datetime (earliest first).
+    This endpoint performs real-time scraping of SRCEI, using direct HTTP calls and
+    falling back to Playwright when the WAF rejects them. Slots are sorted by
+    datetime (earliest first).
+
+    When Redis is configured, responses are cached per (procedure, region).
+    Concurrent misses wait for a single scrape, and if scraping fails the last
+    cached value is returned with an `X-Cache: stale` header.
+
+    At most MAX_CONCURRENT_SCRAPES scrapes run at once across /slots,
+    /slots/stream and /slots/batch. A /slots request that waits
+    longer than a couple of seconds for its turn gets the last cached value
+    (`X-Cache: stale`) if there is one, and keeps waiting otherwise.
 
     Args:
         procedure_id: Procedure type ID (6-15)
         region_id: Chilean region ID (1-16)
         settings: Application settings (injected)
+        browser: Shared Playwright browser (injected)
+        context_limit: Semaphore capping concurrent browser contexts (injected)
+        session_store: Store for the authenticated SRCEI session (injected)
+        scrape_limit: Semaphore capping concurrent scrapes (injected)
+        cache: Slot response cache, None if Redis is not configured (injected)
 
     Returns:
         List of available slots sorted by datetime
@@ -47,63 +213,230 @@ async def get_slots(
     Raises:
         HTTPException: 400 for validation errors, 503 for service unavailable, 504 for timeout
     """
-    logger.info(f"Fetching slots for procedure={procedure_id}, region={region_id}")
+    if cache is None:
+        async with scrape_limit or nullcontext():
+            return ORJSONResponse(
+                await _scrape_slot_list(
+                    procedure_id, region_id, settings, browser, context_limit, session_store
+                )
+            )
+
+    max_age = cache.policy.max_age
+    cached = await cache.get(procedure_id, region_id)
+    if cached is not None:
+        return _cached_response(cached, "hit", max_age)
+
+    # Queue for a scrape slot before taking the cache lock, so the lock's TTL
+    # only has to cover the scrape itself and not the time spent in the queue
+    permit = scrape_limit
+    if permit is not None and not await _acquire_scrape_slot(permit, SCRAPE_QUEUE_WAIT):
+        stale = await cache.get_stale(procedure_id, region_id)
+        if stale is not None:
+            logger.warning("Scrape queue full, serving stale cached slots")
+            return _cached_response(stale, "stale", max_age)
+        # Nothing cached to fall back to; wait for a slot
+        await permit.acquire()
 
     try:
-        # Create SRCEI config from settings
-        config = SRCEIConfig(
-            rut=settings.srcei_rut,
-            password=settings.srcei_password,
-        )
+        async with cache.lock(procedure_id, region_id) as acquired:
+            if acquired:
+                # Another request may have filled the cache while we queued
+                cached = await cache.get(procedure_id, region_id)
+                if cached is not None:
+                    return _cached_response(cached, "hit", max_age)
+            else:
+                # Another request is scraping the same key; free our slot and wait for its result
+                if permit is not None:
+                    permit.release()
+                    permit = None
+                cached = await cache.wait_for(procedure_id, region_id, timeout=CACHE_LOCK_WAIT)
+                if cached is not None:
+                    return _cached_response(cached, "hit", max_age)
+                if scrape_limit is not None:
+                    await scrape_limit.acquire()
+                    permit = scrape_limit
 
-        # Initialize Playwright client and get slots
-        async with SRCEIPlaywrightClient(config, headless=True) as client:
-            # Login
-            if not await client.login():
-                logger.error("Login failed")
-                raise HTTPException(status_code=503, detail="Failed to authenticate with SRCEI")
-
-            # Get slots
-            raw_slots = await client.get_slots_by_region(procedure_id, region_id)
-
-            if not raw_slots:
-                logger.info("No slots found")
-                return SlotListResponse(
-                    slots=[],
-                    count=0,
-                    procedure_id=procedure_id,
-                    region_id=region_id,
-                    scraped_at=datetime.utcnow(),
+            try:
+                result = await _scrape_slot_list(
+                    procedure_id, region_id, settings, browser, context_limit, session_store
                 )
+            except HTTPException:
+                stale = await cache.get_stale(procedure_id, region_id)
+                if stale is None:
+                    raise
+                logger.warning("Scrape failed, serving stale cached slots")
+                return _cached_response(stale, "stale", max_age)
 
-            # Sort slots by datetime
-            sorted_slots = sort_slots_by_datetime(raw_slots)
-
-            # Convert to response format
-            slot_responses = [
-                SlotResponse(
-                    office_name=slot["nombreOficina"],
-                    office_address=slot["direccionOficina"],
-                    date=slot["fechaDisponible"],
-                    time=slot["horaDisponible"],
-                    datetime_iso=format_slot_datetime_iso(slot),
-                    office_id=slot.get("idOficina", ""),
-                )
-                for slot in sorted_slots
-            ]
+            body = dumps(result)
+            # Keep the last non-empty result as the fallback for failed scrapes
+            await cache.set(procedure_id, region_id, body, stale=result["count"] > 0)
+    finally:
+        if permit is not None:
+            permit.release()
+
+    return _cached_response(body, "miss", max_age)
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_slots(
+    procedure_id: str = Query(
+        ...,
+        pattern=PROCEDURE_ID_PATTERN,
+        description="Procedure ID (6=Renovación, 9=Reimpresión, 10=Extranjero, 11=Pasaporte, 12=Menores, 13=Apostilla, 14=Rectificaciones, 15=Vehículos)",
+    ),
+    region_id: str = Query(
+        ...,
+        pattern=REGION_ID_PATTERN,
+        description="Region ID (1-16)",
+    ),
+    settings: Settings = Depends(get_settings),
+    browser: Optional[SharedBrowser] = Depends(get_browser),
+    context_limit: Optional[asyncio.Semaphore] = Depends(get_context_limit),
+    session_store: Optional[SessionStore] = Depends(get_session_store),
+    scrape_limit: Optional[asyncio.Semaphore] = Depends(get_scrape_limit),
+) -> StreamingResponse:
+    """
+    Stream available appointment slots as NDJSON.
+
+    The first line is a header object with procedure_id, region_id and
+    scraped_at; each following line is one slot in the SlotResponse shape.
+    Slots are sent in scrape order, not sorted; sort by datetime_iso on the
+    client if needed. Both clients extract a region's slots in one step, so
+    nothing is sent before the scrape finishes; the gain over GET /slots is
+    that the response is serialized row by row. The scrape holds one of the
+    MAX_CONCURRENT_SCRAPES slots until the response is done.
+
+    Args:
+        procedure_id: Procedure type ID (6-15)
+        region_id: Chilean region ID (1-16)
+        settings: Application settings (injected)
+        browser: Shared Playwright browser (injected)
+        context_limit: Semaphore capping concurrent browser contexts (injected)
+        session_store: Store for the authenticated SRCEI session (injected)
+        scrape_limit: Semaphore capping concurrent scrapes (injected)
+
+    Returns:
+        Streaming NDJSON response
+
+    Raises:
+        HTTPException: 503 if authentication fails, 500 for unexpected errors
+    """
+    logger.info(f"Streaming slots for procedure={procedure_id}, region={region_id}")
 
-            logger.info(f"Successfully retrieved {len(slot_responses)} slots")
+    config = SRCEIConfig(rut=settings.srcei_rut, password=settings.srcei_password)
+    slots = iter_slots(
+        config,
+        procedure_id,
+        region_id,
+        client_type=settings.srcei_client,
+        browser=browser,
+        context_limit=context_limit,
+        session_store=session_store,
+    )
 
-            return SlotListResponse(
-                slots=slot_responses,
-                count=len(slot_responses),
-                procedure_id=procedure_id,
-                region_id=region_id,
-                scraped_at=datetime.utcnow(),
+    async with AsyncExitStack() as stack:
+        await stack.enter_async_context(_scrape_slot(scrape_limit))
+        stack.push_async_callback(slots.aclose)
+
+        # Pull the first slot before streaming so scrape failures still map to a status code
+        try:
+            first_slot = await anext(slots, None)
+        except SRCEIAuthenticationError:
+            logger.error("Login failed")
+            raise HTTPException(status_code=503, detail="Failed to authenticate with SRCEI")
+        except Exception as e:
+            logger.error(f"Error fetching slots: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+        # From here on the response releases the scrape slot when it is done
+        cleanup = stack.pop_all()
+
+    async def ndjson() -> AsyncIterator[bytes]:
+        # Close the scrape (and its browser context) as soon as the body ends; the
+        # response's cleanup still covers a body that never starts
+        try:
+            header = {
+                "procedure_id": procedure_id,
+                "region_id": region_id,
+                "scraped_at": datetime.now(timezone.utc),
+            }
+            yield dumps(header) + b"\n"
+            if first_slot is None:
+                return
+            yield dumps(_slot_row(first_slot, format_slot_datetime_iso(first_slot))) + b"\n"
+            async for slot in slots:
+                yield dumps(_slot_row(slot, format_slot_datetime_iso(slot))) + b"\n"
+        finally:
+            await slots.aclose()
+
+    return ClosingStreamingResponse(
+        ndjson(), on_close=cleanup.aclose, media_type="application/x-ndjson"
+    )
+
+
+@router.post("/batch", response_model=SlotBatchResponse)
+async def get_slots_batch(
+    queries: list[SlotQuery] = Body(..., min_length=1, max_length=20),
+    settings: Settings = Depends(get_settings),
+    browser: Optional[SharedBrowser] = Depends(get_browser),
+    context_limit: Optional[asyncio.Semaphore] = Depends(get_context_limit),
+    session_store: Optional[SessionStore] = Depends(get_session_store),
+    scrape_limit: Optional[asyncio.Semaphore] = Depends(get_scrape_limit),
+) -> ORJSONResponse:
+    """
+    Get available appointment slots for several procedure/region pairs at once.
+
+    Logs in to SRCEI once and scrapes the pairs concurrently, reusing the
+    shared browser with one context per pair. A failing pair is reported in
+    its own result's error field instead of failing the whole batch. The
+    whole batch takes one of the MAX_CONCURRENT_SCRAPES slots.
+
+    Args:
+        queries: List of procedure/region pairs (1-20)
+        settings: Application settings (injected)
+        browser: Shared Playwright browser (injected)
+        context_limit: Semaphore capping concurrent browser contexts (injected)
+        session_store: Store for the authenticated SRCEI session (injected)
+        scrape_limit: Semaphore capping concurrent scrapes (injected)
+
+    Returns:
+        One result per query, in request order, each sorted by datetime
+
+    Raises:
+        HTTPException: 503 if authentication fails
+    """
+    logger.info(f"Fetching slots for batch of {len(queries)} queries")
+
+    config = SRCEIConfig(rut=settings.srcei_rut, password=settings.srcei_password)
+    try:
+        async with _scrape_slot(scrape_limit):
+            results = await scrape_many(
+                config,
+                [(q.procedure_id, q.region_id) for q in queries],
+                client_type=settings.srcei_client,
+                browser=browser,
+                context_limit=context_limit,
+                session_store=session_store,
             )
+    except SRCEIAuthenticationError:
+        logger.error("Login failed")
+        raise HTTPException(status_code=503, detail="Failed to authenticate with SRCEI")
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error fetching slots: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    items = []
+    for query, result in zip(queries, results):
+        item = {
+            "procedure_id": query.procedure_id,
+            "region_id": query.region_id,
+            "slots": [],
+            "count": 0,
+            "error": None,
+        }
+        if isinstance(result, BaseException):
+            logger.error(f"Error fetching slots for {query}: {result}")
+            item["error"] = str(result) or type(result).__name__
+        else:
+            item["slots"] = _build_slot_rows(result)
+            item["count"] = len(item["slots"])
+        items.append(item)
+
+    return ORJSONResponse({"results": items, "scraped_at": datetime.now(timezone.utc)})
@@ -1,9 +1,13 @@
 """Pydantic schemas for slots API."""
 
 from datetime import datetime
+from typing import Optional
 
 from pydantic import BaseModel, Field
 
+PROCEDURE_ID_PATTERN = "^(6|9|10|11|12|13|14|15)$"
+REGION_ID_PATTERN = "^(1[0-6]|[1-9])$"
+
 
 class SlotResponse(BaseModel):
     """Response model for a single slot."""
@@ -26,6 +30,30 @@ class SlotListResponse(BaseModel):
     scraped_at: datetime = Field(..., description="Timestamp of scraping")
 
 
+class SlotQuery(BaseModel):
+    """A procedure and region to fetch slots for."""
+
+    procedure_id: str = Field(..., pattern=PROCEDURE_ID_PATTERN, description="Procedure ID (6-15)")
+    region_id: str = Field(..., pattern=REGION_ID_PATTERN, description="Region ID (1-16)")
+
+
+class SlotBatchItem(BaseModel):
+    """Slots for one query of a batch request."""
+
+    procedure_id: str = Field(..., description="Procedure ID queried")
+    region_id: str = Field(..., description="Region ID queried")
+    slots: list[SlotResponse] = Field(default_factory=list, description="List of available slots")
+    count: int = Field(default=0, description="Number of slots")
+    error: Optional[str] = Field(default=None, description="Error message if this query failed")
+
+
+class SlotBatchResponse(BaseModel):
+    """Response model for a batch of slot queries."""
+
+    results: list[SlotBatchItem] = Field(..., description="One result per query, in request order")
+    scraped_at: datetime = Field(..., description="Timestamp of scraping")
+
+
 class ErrorResponse(BaseModel):
     """Error response model."""
 
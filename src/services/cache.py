@@ -0,0 +1,136 @@
+"""Redis-backed cache for slot responses."""
+
+import asyncio
+import logging
+import uuid
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """Cache lifetimes for an endpoint."""
+
+    ttl: int  # seconds the entry is served as fresh from Redis
+    max_age: int  # seconds clients may cache the response (Cache-Control)
+
+
+CACHE_POLICIES = {
+    "short": CachePolicy(ttl=60, max_age=30),
+    "normal": CachePolicy(ttl=120, max_age=60),
+}
+
+# How long the last good value is kept as a fallback for scrape failures
+STALE_TTL = 24 * 60 * 60
+
+# Compare-and-delete so a lock is only released by its owner
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+else
+    return 0
+end
+"""
+
+
+class SlotCache:
+    """
+    Cache-aside store for serialized slot responses.
+
+    Each entry is written twice: a fresh copy that expires after the policy
+    TTL, and a stale copy kept for STALE_TTL to serve when scraping fails.
+    Callers can skip the stale copy for results not worth falling back to.
+    Redis errors are logged and treated as cache misses.
+    """
+
+    def __init__(self, redis: Redis, policy: CachePolicy = CACHE_POLICIES["normal"]):
+        """
+        Initialize slot cache.
+
+        Args:
+            redis: Async Redis client
+            policy: Cache lifetimes for the cached endpoint
+        """
+        self.redis = redis
+        self.policy = policy
+
+    @staticmethod
+    def key(procedure_id: str, region_id: str) -> str:
+        """Build the cache key for a procedure and region."""
+        return f"slots:{procedure_id}:{region_id}"
+
+    async def get(self, procedure_id: str, region_id: str) -> Optional[bytes]:
+        """Get the fresh cached value, if any."""
+        try:
+            return await self.redis.get(self.key(procedure_id, region_id))
+        except RedisError as e:
+            logger.warning(f"Cache get failed: {e}")
+            return None
+
+    async def get_stale(self, procedure_id: str, region_id: str) -> Optional[bytes]:
+        """Get the last cached value, even if no longer fresh."""
+        try:
+            return await self.redis.get(f"{self.key(procedure_id, region_id)}:stale")
+        except RedisError as e:
+            logger.warning(f"Cache get failed: {e}")
+            return None
+
+    async def set(
+        self, procedure_id: str, region_id: str, value: str | bytes, stale: bool = True
+    ) -> None:
+        """Store a value as the fresh entry, and as the stale entry unless stale is False."""
+        key = self.key(procedure_id, region_id)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(key, value, ex=self.policy.ttl)
+                if stale:
+                    pipe.set(f"{key}:stale", value, ex=STALE_TTL)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Cache set failed: {e}")
+
+    async def wait_for(
+        self, procedure_id: str, region_id: str, timeout: float, interval: float = 0.25
+    ) -> Optional[bytes]:
+        """Poll for a fresh value written by another request, up to timeout seconds."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(interval)
+            value = await self.get(procedure_id, region_id)
+            if value is not None:
+                return value
+        return None
+
+    @asynccontextmanager
+    async def lock(
+        self, procedure_id: str, region_id: str, ttl_ms: int = 60000
+    ) -> AsyncGenerator[bool, None]:
+        """
+        Acquire a distributed lock (SET NX PX) so only one request scrapes on a miss.
+
+        Yields:
+            True if this request holds the lock, False if another one does
+        """
+        lock_key = f"{self.key(procedure_id, region_id)}:lock"
+        token = uuid.uuid4().hex
+        try:
+            acquired = bool(await self.redis.set(lock_key, token, nx=True, px=ttl_ms))
+        except RedisError as e:
+            logger.warning(f"Cache lock failed: {e}")
+            acquired = True  # Scrape without the lock rather than fail
+
+        try:
+            yield acquired
+        finally:
+            try:
+                await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except RedisError as e:
+                logger.warning(f"Cache unlock failed: {e}")
@@ -1,23 +1,71 @@
 """Application settings configuration."""
 
+from functools import lru_cache
+from typing import Literal, Optional
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
-class Settings(BaseSettings):
-    """Application settings loaded from environment variables."""
+class ServerSettings(BaseSettings):
+    """Server settings, readable without SRCEI credentials (e.g. when building the app)."""
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
+    # Server configuration (optional)
+    port: int = Field(default=8080, description="Server port")
+    environment: str = Field(default="production", description="Environment name")
+    profiling_enabled: bool = Field(
+        default=False,
+        description="Allow ?profile=1 to return a pyinstrument report (ignored in production)",
+    )
+
+    @property
+    def profiling_active(self) -> bool:
+        """Whether the profiling middleware should be registered."""
+        return self.profiling_enabled and self.environment != "production"
+
+
+class Settings(ServerSettings):
+    """Application settings loaded from environment variables."""
+
     # SRCEI credentials (required)
     srcei_rut: str = Field(..., description="Chilean RUT with dash (e.g., 12345678-9)")
     srcei_password: str = Field(..., description="SRCEI account password")
 
-    # Server configuration (optional)
-    port: int = Field(default=8080, description="Server port")
-    environment: str = Field(default="production", description="Environment name")
+    # SRCEI client (optional)
+    srcei_client: Literal["http", "playwright"] = Field(
+        default="http",
+        description="Client used to scrape SRCEI; 'http' falls back to Playwright on WAF challenge or bad response",
+    )
+
+    # Browser configuration (optional)
+    max_browser_contexts: int = Field(
+        default=4, description="Maximum concurrent contexts in the shared browser"
+    )
+    max_concurrent_scrapes: int = Field(
+        default=2,
+        description="Maximum scrapes running at once across /slots endpoints; others queue",
+    )
 
+    pw_inspect_stack: bool = Field(
+        default=True,
+        description="Set PW_INSPECT_STACK=0 to skip Playwright's per-call stack capture (saves CPU)",
+    )
 
+    # Cache configuration (optional)
+    redis_url: Optional[str] = Field(
+        default=None, description="Redis URL for the slot response cache; caching is off if unset"
+    )
+
+
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    """Get application settings instance."""
+    """Get application settings instance (read from the environment once per process)."""
     return Settings()
+
+
+@lru_cache(maxsize=1)
+def get_server_settings() -> ServerSettings:
+    """Get server settings instance (read from the environment once per process)."""
+    return ServerSettings()
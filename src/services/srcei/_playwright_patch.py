@@ -0,0 +1,65 @@
+"""Patch out Playwright's per-call stack capture.
+
+Before every API call (click, fill, evaluate, ...) playwright-python walks the
+whole Python stack to record the caller's location for traces and to name the
+API in error messages. Under uvicorn the stack is deep, so this walk is a large
+share of the CPU spent driving the browser.
+
+The replacement only walks up to the first frame outside Playwright, which is
+enough to keep API names in error messages, and records no source location.
+"""
+
+import importlib
+import logging
+import sys
+from types import FrameType, SimpleNamespace
+from typing import Optional
+
+import playwright
+
+logger = logging.getLogger(__name__)
+
+_PLAYWRIGHT_PATH = str(playwright.__path__[0])
+
+# Modules that bind _capture_stack_trace at import time
+_PATCHED_MODULES = (
+    "playwright._impl._connection",
+    "playwright._impl._disposable",
+    "playwright._impl._network",
+    "playwright._impl._sync_base",
+)
+
+
+def _capture_api_name() -> dict:
+    """Drop-in for playwright's _capture_stack_trace that skips the full stack walk."""
+    frame: Optional[FrameType] = sys._getframe(2)
+    api_name = ""
+    while frame:
+        code = frame.f_code
+        if code.co_filename.startswith(_PLAYWRIGHT_PATH):
+            owner = frame.f_locals.get("self")
+            api_name = f"{type(owner).__name__}.{code.co_name}" if owner else code.co_name
+        elif api_name:
+            break
+        frame = frame.f_back
+    return {"frames": [], "apiName": api_name, "title": None}
+
+
+def disable_stack_capture() -> None:
+    """Replace Playwright's stack capture with the cheap version above."""
+    connection = importlib.import_module("playwright._impl._connection")
+
+    if not hasattr(connection, "_capture_stack_trace"):
+        # Older Playwright releases call inspect.stack() directly
+        connection.inspect = SimpleNamespace(**vars(connection.inspect), stack=lambda *_: [])
+        logger.info("Playwright inspect.stack disabled")
+        return
+
+    for name in _PATCHED_MODULES:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            continue
+        if hasattr(module, "_capture_stack_trace"):
+            module._capture_stack_trace = _capture_api_name
+    logger.info("Playwright stack capture disabled")
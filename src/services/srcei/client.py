@@ -2,14 +2,197 @@
 
 import asyncio
 import logging
+import re
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
 from typing import Optional
 
-from playwright.async_api import Page, Browser, BrowserContext, async_playwright
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    Page,
+    Playwright,
+    Route,
+    async_playwright,
+)
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
-from .config import SRCEIConfig
+from .config import CARD_SELECTOR, SRCEIConfig
+from .exceptions import SRCEIResponseError
 
 logger = logging.getLogger(__name__)
 
+BROWSER_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--no-sandbox",
+]
+
+
+async def launch_browser(playwright: Playwright, headless: bool = True) -> Browser:
+    """Launch Chromium with the flags used for SRCEI scraping."""
+    return await playwright.chromium.launch(headless=headless, args=BROWSER_ARGS)
+
+
+class SharedBrowser:
+    """
+    Chromium browser shared by scrapes, launched on first use.
+
+    Launching lazily keeps startup working without Chromium when Playwright is
+    only a fallback. If the browser process dies (crash, OOM kill), the next
+    get() launches a new one instead of every scrape failing until restart.
+    """
+
+    def __init__(self, headless: bool = True):
+        """
+        Initialize shared browser.
+
+        Args:
+            headless: Run browser in headless mode
+        """
+        self.headless = headless
+
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Browser:
+        """Get the running browser, launching or relaunching it if needed."""
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._browser is not None:
+                    logger.warning("Shared Playwright browser disconnected, relaunching")
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await launch_browser(self._playwright, headless=self.headless)
+                logger.info("Shared Playwright browser started")
+            return self._browser
+
+    async def close(self) -> None:
+        """Close the browser and stop Playwright, if they were started."""
+        if self._browser is not None and self._browser.is_connected():
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = None
+        self._playwright = None
+
+    async def __aenter__(self):
+        """Async context manager entry."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit."""
+        await self.close()
+
+
+# Page reached after a successful login
+SELECTION_URL_RE = re.compile(r".*seleccion.*", re.IGNORECASE)
+
+# True once a bookable slot card or the "no slots" message is on the page
+SLOTS_READY_JS = """
+    (cardSelector) =>
+        [...document.querySelectorAll(cardSelector)].some(c => (c.innerText || '').includes('Agendar'))
+        || document.body.innerText.includes('No hay')
+"""
+
+# Extracts unique slots from the rendered cards; constants and regexes are
+# built once per call rather than once per card
+EXTRACT_SLOTS_JS = """
+    (cardSelector) => {
+        const MONTH_MAP = {
+            'enero': '01', 'febrero': '02', 'marzo': '03', 'abril': '04',
+            'mayo': '05', 'junio': '06', 'julio': '07', 'agosto': '08',
+            'septiembre': '09', 'octubre': '10', 'noviembre': '11', 'diciembre': '12'
+        };
+        const MONTH_RE = /^(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)$/i;
+        const DAY_RE = /^\\d{1,2}$/;
+        const TIME_RE = /^\\d{1,2}:\\d{2}$/;
+        const YEAR = new Date().getFullYear();
+
+        // Unique slots keyed on (office, date, time), first occurrence wins
+        const slots = new Map();
+
+        for (const card of document.querySelectorAll(cardSelector)) {
+            const text = card.innerText || '';
+
+            if (!text.includes('Agendar')) continue;
+
+            const lines = text.split('\\n').map(t => t.trim()).filter(t => t);
+
+            const officeName = lines[0] || '';
+            const address = lines[1] || '';
+            let day = '';
+            let month = '';
+            let time = '';
+
+            for (const line of lines) {
+                if (DAY_RE.test(line)) {
+                    const n = parseInt(line);
+                    if (n >= 1 && n <= 31) day = line;
+                } else if (MONTH_RE.test(line)) {
+                    month = MONTH_MAP[line.toLowerCase()];
+                } else if (TIME_RE.test(line)) {
+                    time = line;
+                }
+            }
+
+            if (!(officeName && day && month)) continue;
+
+            const fecha = `${day.padStart(2, '0')}/${month}/${YEAR}`;
+            const hora = time || '00:00';
+
+            const key = JSON.stringify([officeName, fecha, hora]);
+            if (slots.has(key)) continue;
+
+            slots.set(key, {
+                nombreOficina: officeName,
+                direccionOficina: address,
+                fechaDisponible: fecha,
+                horaDisponible: hora,
+                idOficina: ''
+            });
+        }
+
+        return [...slots.values()];
+    }
+"""
+
+# Requests irrelevant to scraping text nodes, aborted to cut page-load time.
+# Stylesheets stay: slot extraction splits card.innerText on line breaks,
+# which depend on the computed layout.
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+BLOCKED_HOSTS = ("google-analytics.com", "googletagmanager.com", "doubleclick.net", "hotjar")
+
+DISABLE_ANIMATIONS_SCRIPT = """
+    document.addEventListener('DOMContentLoaded', () => {
+        const style = document.createElement('style');
+        style.textContent = '*, *::before, *::after { animation: none !important; transition: none !important; }';
+        document.head.appendChild(style);
+    });
+"""
+
+
+async def block_unneeded_resources(route: Route) -> None:
+    """Abort images, fonts, media and analytics; continue the rest."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(
+        host in request.url for host in BLOCKED_HOSTS
+    ):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+@dataclass(frozen=True)
+class SRCEISession:
+    """Authenticated SRCEI browser session that can be reopened in a new context."""
+
+    storage_state: dict  # Cookies and local storage from BrowserContext.storage_state()
+    selection_url: str  # Procedure selection page reached after login
+
 
 class SRCEIPlaywrightClient:
     """
@@ -20,37 +203,47 @@ class SRCEIPlaywrightClient:
 
     BASE_URL = "https://solicitudeswebrc.srcei.cl/ReservaDeHoraSRCEI"
 
-    def __init__(self, config: SRCEIConfig, headless: bool = True):
+    def __init__(
+        self,
+        config: SRCEIConfig,
+        headless: bool = True,
+        browser: Optional[Browser] = None,
+        session: Optional[SRCEISession] = None,
+    ):
         """
         Initialize SRCEI Playwright client.
 
         Args:
             config: SRCEIConfig instance with credentials
             headless: Run browser in headless mode
+            browser: Shared browser to open a context in; if not given, the
+                client launches (and closes) its own browser
+            session: Previously exported session to open the context with;
+                call resume_session() instead of login() to use it
         """
         self.config = config
         self.headless = headless
+        self.session = session
 
         self.playwright = None
-        self.browser: Optional[Browser] = None
+        self.browser: Optional[Browser] = browser
+        self.owns_browser = browser is None
         self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
         self.is_authenticated = False
 
     async def start_browser(self) -> None:
-        """Start the Playwright browser."""
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=self.headless,
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--no-sandbox",
-            ],
-        )
+        """Start the Playwright browser (if not shared) and open a new context."""
+        if self.browser is None:
+            self.playwright = await async_playwright().start()
+            self.browser = await launch_browser(self.playwright, headless=self.headless)
         self.context = await self.browser.new_context(
             viewport={"width": 1280, "height": 720},
             user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            storage_state=self.session.storage_state if self.session else None,
         )
+        await self.context.route("**/*", block_unneeded_resources)
+        await self.context.add_init_script(DISABLE_ANIMATIONS_SCRIPT)
         self.page = await self.context.new_page()
 
         # Add stealth settings
@@ -59,15 +252,16 @@ class SRCEIPlaywrightClient:
         """)
 
     async def close(self) -> None:
-        """Close the browser and cleanup."""
+        """Close the context, and the browser if this client launched it."""
         if self.page:
             await self.page.close()
         if self.context:
             await self.context.close()
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        if self.owns_browser:
+            if self.browser:
+                await self.browser.close()
+            if self.playwright:
+                await self.playwright.stop()
 
     async def __aenter__(self):
         """Async context manager entry."""
@@ -90,8 +284,7 @@ class SRCEIPlaywrightClient:
 
         try:
             logger.info("Navigating to login page...")
-            await self.page.goto(f"{self.BASE_URL}/web/init.srcei", wait_until="networkidle")
-            await asyncio.sleep(1)
+            await self.page.goto(f"{self.BASE_URL}/web/init.srcei", wait_until="domcontentloaded")
 
             # Check if WAF blocked
             title = await self.page.title()
@@ -110,26 +303,89 @@ class SRCEIPlaywrightClient:
             # Click login button
             await self.page.click('button[type="submit"], input[type="submit"], .btn-primary')
 
-            # Wait for navigation
-            await self.page.wait_for_load_state("networkidle")
-            await asyncio.sleep(2)
+            # Wait for navigation to the selection page
+            try:
+                await self.page.wait_for_url(SELECTION_URL_RE, timeout=15000)
+            except PlaywrightTimeoutError:
+                await self.page.wait_for_load_state("domcontentloaded")
 
             # Check if login successful
-            current_url = self.page.url
-            title = await self.page.title()
-
-            if "seleccion" in current_url.lower() or "Reserva de Hora" in title:
+            if await self._on_selection_page():
                 self.is_authenticated = True
                 logger.info("Login successful")
                 return True
             else:
-                logger.error(f"Login failed. Current page: {title}")
+                logger.error(f"Login failed. Current page: {await self.page.title()}")
                 return False
 
         except Exception as e:
             logger.error(f"Login error: {e}")
             return False
 
+    async def _on_selection_page(self) -> bool:
+        """Whether the page shows the procedure selection page reached after login."""
+        return bool(SELECTION_URL_RE.match(self.page.url)) or (
+            "Reserva de Hora" in await self.page.title()
+        )
+
+    async def export_session(self) -> SRCEISession:
+        """
+        Export the authenticated session so other contexts can skip login.
+
+        Returns:
+            SRCEISession with the context's storage state and selection page URL
+        """
+        if not self.is_authenticated:
+            raise ValueError("Must login first")
+        return SRCEISession(
+            storage_state=await self.context.storage_state(),
+            selection_url=self.page.url,
+        )
+
+    async def resume_session(self) -> bool:
+        """
+        Open the selection page using the session given at construction.
+
+        Returns:
+            True if the session is still valid, False if SRCEI asked to log in again
+        """
+        if not self.session:
+            return False
+        if not self.page:
+            await self.start_browser()
+
+        try:
+            await self.page.goto(self.session.selection_url, wait_until="domcontentloaded")
+            # Same test as login(); an expired session lands on the login form instead
+            if not await self._on_selection_page() or await self.page.query_selector(
+                'input[name="run"]'
+            ):
+                logger.info("Stored session expired")
+                return False
+
+            self.is_authenticated = True
+            return True
+
+        except Exception as e:
+            logger.error(f"Error resuming session: {e}")
+            return False
+
+    async def adopt_session(self, session: SRCEISession) -> bool:
+        """
+        Switch this client's context to another session and open its selection page.
+
+        Args:
+            session: Session exported by another client
+
+        Returns:
+            True if the session is valid
+        """
+        if not self.context:
+            await self.start_browser()
+        await self.context.add_cookies(session.storage_state.get("cookies", []))
+        self.session = session
+        return await self.resume_session()
+
     async def select_procedure(self, procedure_id: str) -> bool:
         """
         Select a procedure from the selection page.
@@ -158,21 +414,20 @@ class SRCEIPlaywrightClient:
         logger.info(f"Selecting procedure: {procedure_name}")
 
         try:
-            # Try different selectors
-            selectors = [
-                f'button:has-text("{procedure_name}")',
-                f'text="{procedure_name}"',
-                f'button:text-is("{procedure_name}")',
-            ]
+            # Race the selector variants instead of trying each with its own timeout
+            button = (
+                self.page.locator(f'button:has-text("{procedure_name}")')
+                .or_(self.page.locator(f'button:text-is("{procedure_name}")'))
+                .or_(self.page.get_by_text(procedure_name, exact=True))
+                .first
+            )
 
             clicked = False
-            for selector in selectors:
-                try:
-                    await self.page.click(selector, timeout=3000)
-                    clicked = True
-                    break
-                except Exception:
-                    continue
+            try:
+                await button.click(timeout=5000)
+                clicked = True
+            except PlaywrightTimeoutError:
+                pass
 
             if not clicked:
                 # Try clicking by button text match
@@ -185,8 +440,8 @@ class SRCEIPlaywrightClient:
                         break
 
             if clicked:
-                await self.page.wait_for_load_state("networkidle")
-                await asyncio.sleep(1)
+                # Wait for the region dropdown to appear
+                await self.page.wait_for_selector("select", timeout=10000)
                 logger.info("Procedure selected")
                 return True
             else:
@@ -210,35 +465,18 @@ class SRCEIPlaywrightClient:
         logger.info(f"Selecting region ID: {region_id}")
 
         try:
-            await asyncio.sleep(1)
-
-            # Try multiple selectors for the dropdown
-            selectors = [
-                "select",
-                'select[name="idRegion"]',
-                "select#idRegion",
-                "select.form-control",
-            ]
-
-            selected = False
-            for selector in selectors:
-                try:
-                    select_elem = await self.page.query_selector(selector)
-                    if select_elem:
-                        await self.page.select_option(selector, region_id)
-                        selected = True
-                        logger.info(f"Selected region: {region_id}")
-                        break
-                except Exception:
-                    continue
-
-            if not selected:
+            # "select" also matches the idRegion/form-control variants; wait for
+            # whichever renders first instead of probing each in turn
+            try:
+                await self.page.locator("select").first.select_option(region_id, timeout=5000)
+            except PlaywrightTimeoutError:
                 logger.error("Could not find region dropdown")
                 return False
 
+            logger.info(f"Selected region: {region_id}")
+
             # Wait for page to react
-            await asyncio.sleep(1)
-            await self.page.wait_for_load_state("networkidle")
+            await self.page.wait_for_load_state("domcontentloaded")
 
             return True
 
@@ -256,99 +494,55 @@ class SRCEIPlaywrightClient:
 
         Returns:
             List of slot dictionaries
+
+        Raises:
+            SRCEIResponseError: If the slots page does not render as expected
+        """
+        return [slot async for slot in self.iter_slots(procedure_id, region_id)]
+
+    async def iter_slots(self, procedure_id: str, region_id: str) -> AsyncIterator[dict]:
+        """
+        Yield available appointment slots for a region as they are extracted.
+
+        Args:
+            procedure_id: Procedure type ID
+            region_id: Region ID
+
+        Yields:
+            Unique slot dictionaries
+
+        Raises:
+            SRCEIResponseError: If the procedure, region or slots page does not
+                render as expected
         """
         if not self.is_authenticated:
             raise ValueError("Must login first")
 
         # Select procedure
         if not await self.select_procedure(procedure_id):
-            return []
+            raise SRCEIResponseError(f"Could not select procedure {procedure_id}")
 
         # Select region
         if not await self.select_region(region_id):
-            return []
+            raise SRCEIResponseError(f"Could not select region {region_id}")
 
         logger.info("Fetching available slots...")
 
         try:
-            # Wait for slots to load
-            await asyncio.sleep(2)
-
-            # Extract slots using JavaScript
-            slots_data = await self.page.evaluate("""
-                () => {
-                    const slots = [];
-
-                    const cards = document.querySelectorAll('.card, [class*="card"], .col-md-6 > div, .col-lg-4 > div');
-
-                    cards.forEach(card => {
-                        const text = card.innerText || '';
-
-                        if (!text.includes('Agendar')) return;
-
-                        const lines = text.split('\\n').map(t => t.trim()).filter(t => t);
-
-                        let officeName = '';
-                        let address = '';
-                        let day = '';
-                        let month = '';
-                        let time = '';
-
-                        if (lines.length > 0) officeName = lines[0];
-                        if (lines.length > 1) address = lines[1];
-
-                        const monthNames = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
-                                          'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'];
-
-                        for (const line of lines) {
-                            if (/^\\d{1,2}$/.test(line) && parseInt(line) >= 1 && parseInt(line) <= 31) {
-                                day = line;
-                            }
-                            if (monthNames.some(m => line.toLowerCase() === m.toLowerCase())) {
-                                month = line;
-                            }
-                            if (/^\\d{1,2}:\\d{2}$/.test(line)) {
-                                time = line;
-                            }
-                        }
-
-                        if (officeName && day && month) {
-                            const monthMap = {
-                                'enero': '01', 'febrero': '02', 'marzo': '03', 'abril': '04',
-                                'mayo': '05', 'junio': '06', 'julio': '07', 'agosto': '08',
-                                'septiembre': '09', 'octubre': '10', 'noviembre': '11', 'diciembre': '12'
-                            };
-
-                            const dayPadded = day.padStart(2, '0');
-                            const monthNum = monthMap[month.toLowerCase()] || '01';
-                            const year = new Date().getFullYear();
-
-                            slots.push({
-                                nombreOficina: officeName,
-                                direccionOficina: address,
-                                fechaDisponible: `${dayPadded}/${monthNum}/${year}`,
-                                horaDisponible: time || '00:00',
-                                idOficina: ''
-                            });
-                        }
-                    });
-
-                    return slots;
-                }
-            """)
+            # Wait for slot cards or the "no slots" message, whichever renders first
+            await self.page.wait_for_function(SLOTS_READY_JS, arg=CARD_SELECTOR, timeout=15000)
 
-            # Remove duplicates
-            seen = set()
-            unique_slots = []
-            for slot in slots_data:
-                key = f"{slot['nombreOficina']}_{slot['fechaDisponible']}_{slot['horaDisponible']}"
-                if key not in seen:
-                    seen.add(key)
-                    unique_slots.append(slot)
+            # Extract unique slots using JavaScript
+            unique_slots = await self.page.evaluate(EXTRACT_SLOTS_JS, CARD_SELECTOR)
 
             logger.info(f"Found {len(unique_slots)} unique slots")
-            return unique_slots
 
+        except PlaywrightTimeoutError as e:
+            logger.error("Neither slot cards nor the no-slots message rendered")
+            raise SRCEIResponseError("Slots page did not render") from e
         except Exception as e:
             logger.error(f"Error fetching slots: {e}")
-            return []
+            raise SRCEIResponseError(f"Error fetching slots: {e}") from e
+
+        for slot in unique_slots:
+            yield slot
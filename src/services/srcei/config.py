@@ -2,6 +2,9 @@
 
 from pydantic import BaseModel, field_validator
 
+# CSS selector matching slot cards on the SRCEI slots page
+CARD_SELECTOR = '.card, [class*="card"], .col-md-6 > div, .col-lg-4 > div'
+
 
 class SRCEIConfig(BaseModel):
     """Configuration for SRCEI appointment booking client."""
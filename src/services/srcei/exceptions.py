@@ -0,0 +1,17 @@
+"""Exceptions raised by SRCEI clients."""
+
+
+class SRCEIError(Exception):
+    """Base exception for SRCEI client errors."""
+
+
+class SRCEIAuthenticationError(SRCEIError):
+    """Raised when login to SRCEI fails."""
+
+
+class SRCEIWAFChallengeError(SRCEIError):
+    """Raised when the SRCEI WAF rejects a plain HTTP request."""
+
+
+class SRCEIResponseError(SRCEIError):
+    """Raised when SRCEI answers with a page or payload the client cannot parse."""
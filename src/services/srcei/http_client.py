@@ -0,0 +1,286 @@
+"""SRCEI HTTP client for slot scraping (async, no browser)."""
+
+import logging
+import re
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Optional
+from urllib.parse import urljoin
+
+import httpx
+from selectolax.lexbor import LexborHTMLParser
+
+from .config import CARD_SELECTOR, SRCEIConfig
+from .exceptions import SRCEIResponseError, SRCEIWAFChallengeError
+from .recommender import dedupe_slots
+
+logger = logging.getLogger(__name__)
+
+MONTHS = {
+    "enero": "01",
+    "febrero": "02",
+    "marzo": "03",
+    "abril": "04",
+    "mayo": "05",
+    "junio": "06",
+    "julio": "07",
+    "agosto": "08",
+    "septiembre": "09",
+    "octubre": "10",
+    "noviembre": "11",
+    "diciembre": "12",
+}
+
+DAY_RE = re.compile(r"^\d{1,2}$")
+TIME_RE = re.compile(r"^\d{1,2}:\d{2}$")
+
+# Keys every slot needs to be sorted and returned by the API
+SLOT_KEYS = ("nombreOficina", "direccionOficina", "fechaDisponible", "horaDisponible")
+
+# Text SRCEI shows when a region has no available slots
+NO_SLOTS_TEXT = "No hay"
+
+
+def parse_slots_html(html: str) -> list[dict]:
+    """
+    Extract slots from the SRCEI slots page HTML.
+
+    Mirrors the card parsing done in the browser by SRCEIPlaywrightClient.
+
+    Args:
+        html: Raw HTML of the slots page
+
+    Returns:
+        List of slot dictionaries (may contain duplicates)
+    """
+    year = datetime.now().year
+    slots = []
+
+    for card in LexborHTMLParser(html).css(CARD_SELECTOR):
+        text = card.text(separator="\n")
+        if "Agendar" not in text:
+            continue
+
+        lines = [line.strip() for line in text.split("\n") if line.strip()]
+        office_name = lines[0] if lines else ""
+        address = lines[1] if len(lines) > 1 else ""
+        day = month = time = ""
+
+        for line in lines:
+            if DAY_RE.match(line) and 1 <= int(line) <= 31:
+                day = line
+            if line.lower() in MONTHS:
+                month = MONTHS[line.lower()]
+            if TIME_RE.match(line):
+                time = line
+
+        if office_name and day and month:
+            slots.append(
+                {
+                    "nombreOficina": office_name,
+                    "direccionOficina": address,
+                    "fechaDisponible": f"{day.zfill(2)}/{month}/{year}",
+                    "horaDisponible": time or "00:00",
+                    "idOficina": "",
+                }
+            )
+
+    return slots
+
+
+def parse_slots_json(data: object) -> list[dict]:
+    """
+    Validate slots returned by SRCEI as JSON.
+
+    Args:
+        data: Decoded JSON body of the slots response
+
+    Returns:
+        List of slot dictionaries (may contain duplicates)
+
+    Raises:
+        ValueError: If the body is not a list of slots with the expected keys
+    """
+    if not isinstance(data, list):
+        raise ValueError(f"Expected a list of slots, got {type(data).__name__}")
+    for slot in data:
+        if not isinstance(slot, dict) or not all(key in slot for key in SLOT_KEYS):
+            raise ValueError(f"Unexpected slot shape: {slot!r:.200}")
+    return data
+
+
+class SRCEIHttpClient:
+    """
+    Async HTTP client for SRCEI appointment system.
+
+    Talks to the SRCEI endpoints directly instead of driving a browser. Raises
+    SRCEIWAFChallengeError when the WAF rejects the request, and
+    SRCEIResponseError when the slots endpoint answers with something it
+    cannot parse, so callers can fall back to SRCEIPlaywrightClient.
+    """
+
+    LOGIN_PATH = "/web/init.srcei"
+    SLOTS_PATH = "/web/buscarHorasDisponibles.srcei"
+
+    USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+    def __init__(self, config: SRCEIConfig):
+        """
+        Initialize SRCEI HTTP client.
+
+        Args:
+            config: SRCEIConfig instance with credentials
+        """
+        self.config = config
+
+        self.client: Optional[httpx.AsyncClient] = None
+        self.is_authenticated = False
+
+    async def start(self) -> None:
+        """Create the HTTP client with a persistent cookie jar."""
+        self.client = httpx.AsyncClient(
+            base_url=self.config.base_url,
+            http2=True,
+            timeout=self.config.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": self.USER_AGENT},
+        )
+
+    async def close(self) -> None:
+        """Close the HTTP client."""
+        if self.client:
+            await self.client.aclose()
+
+    async def __aenter__(self):
+        """Async context manager entry."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit."""
+        await self.close()
+
+    @staticmethod
+    def _check_waf(response: httpx.Response) -> None:
+        """Raise SRCEIWAFChallengeError if the response is a WAF rejection."""
+        if response.status_code == 403 or "Request Rejected" in response.text:
+            raise SRCEIWAFChallengeError(f"WAF rejected request to {response.url}")
+
+    async def login(self) -> bool:
+        """
+        Authenticate with SRCEI using ClaveÚnica credentials.
+
+        Returns:
+            True if login successful, False if SRCEI rejected the credentials
+
+        Raises:
+            SRCEIWAFChallengeError: If the WAF rejects the request
+            SRCEIResponseError: If the login pages are not the ones this client
+                expects, or the request fails
+        """
+        if not self.client:
+            await self.start()
+
+        try:
+            logger.info("Fetching login page...")
+            response = await self.client.get(self.LOGIN_PATH)
+            self._check_waf(response)
+            response.raise_for_status()
+
+            # Post to the form action, carrying over any hidden fields
+            forms = LexborHTMLParser(response.text).css("form")
+            form = next((f for f in forms if f.css_first('input[name="run"]')), None)
+            if form is None:
+                # e.g. a login form rendered by JavaScript
+                raise ValueError("No login form in login page")
+            login_url = urljoin(str(response.url), form.attributes.get("action") or "")
+            data = {}
+            for field in form.css('input[type="hidden"]'):
+                name = field.attributes.get("name")
+                if name:
+                    data[name] = field.attributes.get("value") or ""
+
+            logger.info(f"Logging in as: {self.config.rut}")
+            data.update({"run": self.config.rut, "pass": self.config.password})
+            response = await self.client.post(login_url, data=data)
+            self._check_waf(response)
+            response.raise_for_status()
+
+        except SRCEIWAFChallengeError:
+            raise
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"Login error: {e}")
+            raise SRCEIResponseError(f"Unexpected login response: {e}") from e
+
+        # A failed login re-renders the login form; success redirects to the selection page
+        if LexborHTMLParser(response.text).css_first('input[name="run"]') is not None:
+            logger.error(f"Login failed. Current page: {response.url}")
+            return False
+
+        self.is_authenticated = True
+        logger.info("Login successful")
+        return True
+
+    async def get_slots_by_region(self, procedure_id: str, region_id: str) -> list[dict]:
+        """
+        Get available appointment slots for a region.
+
+        Args:
+            procedure_id: Procedure type ID
+            region_id: Region ID
+
+        Returns:
+            List of slot dictionaries
+
+        Raises:
+            SRCEIWAFChallengeError: If the WAF rejects the request
+            SRCEIResponseError: If the slots response cannot be parsed
+        """
+        return [slot async for slot in self.iter_slots(procedure_id, region_id)]
+
+    async def iter_slots(self, procedure_id: str, region_id: str) -> AsyncIterator[dict]:
+        """
+        Yield available appointment slots for a region.
+
+        Args:
+            procedure_id: Procedure type ID
+            region_id: Region ID
+
+        Yields:
+            Unique slot dictionaries
+
+        Raises:
+            SRCEIWAFChallengeError: If the WAF rejects the request
+            SRCEIResponseError: If the slots response cannot be parsed
+        """
+        if not self.is_authenticated:
+            raise ValueError("Must login first")
+
+        logger.info("Fetching available slots...")
+
+        try:
+            response = await self.client.post(
+                self.SLOTS_PATH,
+                data={"idTramite": procedure_id, "idRegion": region_id},
+            )
+            self._check_waf(response)
+            response.raise_for_status()
+
+            if "json" in response.headers.get("content-type", ""):
+                slots_data = parse_slots_json(response.json())
+            else:
+                slots_data = parse_slots_html(response.text)
+                if not slots_data and NO_SLOTS_TEXT not in response.text:
+                    raise ValueError("No slot cards or no-slots message in response")
+
+        except SRCEIWAFChallengeError:
+            raise
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"Error fetching slots: {e}")
+            raise SRCEIResponseError(f"Unexpected slots response: {e}") from e
+
+        unique_slots = dedupe_slots(slots_data)
+        logger.info(f"Found {len(unique_slots)} unique slots")
+
+        for slot in unique_slots:
+            yield slot
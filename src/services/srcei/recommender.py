@@ -1,6 +1,7 @@
 """Slot sorting and filtering utilities for SRCEI appointments."""
 
 from datetime import datetime
+from functools import lru_cache
 
 
 def parse_slot_date(fecha_disponible: str) -> str:
@@ -8,11 +9,14 @@ def parse_slot_date(fecha_disponible: str) -> str:
     Parse SRCEI date format to ISO format.
 
     Args:
-        fecha_disponible: Date in DD/MM/YYYY format
+        fecha_disponible: Date in DD/MM/YYYY format (D/M/YYYY is also accepted)
 
     Returns:
         Date in YYYY-MM-DD format (ISO 8601)
     """
+    # SRCEI dates are zero-padded, so slicing covers almost every call
+    if len(fecha_disponible) == 10 and fecha_disponible[2] == fecha_disponible[5] == "/":
+        return f"{fecha_disponible[6:]}-{fecha_disponible[3:5]}-{fecha_disponible[:2]}"
     day, month, year = fecha_disponible.split("/")
     return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
 
@@ -32,6 +36,38 @@ def format_slot_datetime(slot: dict) -> str:
     return f"{iso_date} {time_str}"
 
 
+@lru_cache(maxsize=4096)
+def _parse_slot_datetime(fecha_disponible: str, hora_disponible: str) -> tuple[str, int]:
+    """
+    Parse a slot date and time into its ISO string and sort key.
+
+    Many slots share a date and time (one per office), so results are cached.
+    The sort key packs the datetime into an int (YYYYMMDDHHMM) so slots
+    compare with a single integer comparison.
+
+    Args:
+        fecha_disponible: Date in DD/MM/YYYY format
+        hora_disponible: Time in HH:MM format
+
+    Returns:
+        Tuple of ISO 8601 datetime string and integer sort key
+    """
+    iso_date = parse_slot_date(fecha_disponible)
+    hour, minute = hora_disponible.split(":")
+    key = int(iso_date.replace("-", "")) * 10_000 + int(hour) * 100 + int(minute)
+    return f"{iso_date}T{hora_disponible}:00", key
+
+
+def _iso_and_key(slot: dict) -> tuple[str, int]:
+    """ISO 8601 datetime string and integer sort key for a slot."""
+    return _parse_slot_datetime(slot["fechaDisponible"], slot["horaDisponible"])
+
+
+def _sort_key(slot: dict) -> int:
+    """Integer sort key for a slot (see _iso_and_key)."""
+    return _iso_and_key(slot)[1]
+
+
 def sort_slots_by_datetime(slots: list[dict]) -> list[dict]:
     """
     Sort slots by date and time (earliest first).
@@ -42,7 +78,22 @@ def sort_slots_by_datetime(slots: list[dict]) -> list[dict]:
     Returns:
         Sorted list of slots
     """
-    return sorted(slots, key=format_slot_datetime)
+    return sorted(slots, key=_sort_key)
+
+
+def sort_slots_with_iso(slots: list[dict]) -> list[tuple[str, dict]]:
+    """
+    Sort slots by date and time, parsing each slot only once.
+
+    Args:
+        slots: List of slot dictionaries
+
+    Returns:
+        Sorted list of (ISO 8601 datetime string, slot) pairs
+    """
+    decorated = [(*_iso_and_key(slot), slot) for slot in slots]
+    decorated.sort(key=lambda item: item[1])
+    return [(iso, slot) for iso, _, slot in decorated]
 
 
 def format_slot_datetime_iso(slot: dict) -> str:
@@ -55,6 +106,24 @@ def format_slot_datetime_iso(slot: dict) -> str:
     Returns:
         ISO 8601 datetime string (e.g., "2026-01-29T09:30:00")
     """
-    iso_date = parse_slot_date(slot["fechaDisponible"])
-    time_str = slot["horaDisponible"]
-    return f"{iso_date}T{time_str}:00"
+    return _iso_and_key(slot)[0]
+
+
+def dedupe_slots(slots: list[dict]) -> list[dict]:
+    """
+    Remove duplicate slots, keeping the first occurrence.
+
+    Args:
+        slots: List of slot dictionaries
+
+    Returns:
+        List of unique slots by office, date and time
+    """
+    seen = set()
+    unique_slots = []
+    for slot in slots:
+        key = (slot["nombreOficina"], slot["fechaDisponible"], slot["horaDisponible"])
+        if key not in seen:
+            seen.add(key)
+            unique_slots.append(slot)
+    return unique_slots
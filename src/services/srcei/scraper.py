@@ -0,0 +1,343 @@
+"""Slot scraping entry point that picks the SRCEI client to use."""
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+from .client import SharedBrowser, SRCEIPlaywrightClient
+from .config import SRCEIConfig
+from .exceptions import (
+    SRCEIAuthenticationError,
+    SRCEIResponseError,
+    SRCEIWAFChallengeError,
+)
+from .http_client import SRCEIHttpClient
+from .session import SessionStore
+
+logger = logging.getLogger(__name__)
+
+# Maximum scrapes a single batch runs at once
+BATCH_MAX_PARALLEL = 4
+
+# HTTP client errors that are retried with Playwright
+FALLBACK_ERRORS = (SRCEIWAFChallengeError, SRCEIResponseError)
+
+
+async def authenticate(
+    client: SRCEIPlaywrightClient, session_store: Optional[SessionStore] = None
+) -> None:
+    """
+    Authenticate a Playwright client, reusing the stored session when possible.
+
+    If the client was opened with a stored session that is still valid, login
+    is skipped. Otherwise, under the store's lock so concurrent scrapes log in
+    only once, the client adopts a session refreshed by another scrape or
+    logs in and stores its own.
+
+    Raises:
+        SRCEIAuthenticationError: If login fails
+    """
+    if client.session and await client.resume_session():
+        return
+
+    async with session_store.lock if session_store else nullcontext():
+        if session_store:
+            if client.session:
+                session_store.invalidate(client.session)
+            fresh = session_store.get()
+            if fresh and await client.adopt_session(fresh):
+                return
+
+        if not await client.login():
+            raise SRCEIAuthenticationError("Failed to authenticate with SRCEI")
+
+        if session_store:
+            session_store.set(await client.export_session())
+
+
+@contextmanager
+def invalidate_session_on_error(
+    client: SRCEIPlaywrightClient, session_store: Optional[SessionStore] = None
+) -> Iterator[None]:
+    """
+    Drop the client's stored session if scraping with it hits an unexpected page.
+
+    resume_session() cannot recognise every way SRCEI reports an expired
+    session, so a failed scrape that reused the stored session forces the
+    next scrape to log in again.
+    """
+    try:
+        yield
+    except SRCEIResponseError:
+        if session_store and client.session:
+            session_store.invalidate(client.session)
+        raise
+
+
+async def iter_with_http(
+    config: SRCEIConfig, procedure_id: str, region_id: str
+) -> AsyncIterator[dict]:
+    """
+    Yield slots scraped with the plain HTTP client.
+
+    Raises:
+        SRCEIAuthenticationError: If SRCEI rejects the credentials
+        SRCEIWAFChallengeError: If the WAF rejects the request
+        SRCEIResponseError: If the login or slots response cannot be parsed
+    """
+    async with SRCEIHttpClient(config) as client:
+        if not await client.login():
+            raise SRCEIAuthenticationError("Failed to authenticate with SRCEI")
+        async for slot in client.iter_slots(procedure_id, region_id):
+            yield slot
+
+
+async def iter_with_playwright(
+    config: SRCEIConfig,
+    procedure_id: str,
+    region_id: str,
+    browser: Optional[SharedBrowser] = None,
+    context_limit: Optional[asyncio.Semaphore] = None,
+    session_store: Optional[SessionStore] = None,
+) -> AsyncIterator[dict]:
+    """
+    Yield slots scraped with the Playwright browser client.
+
+    When a shared browser is given, only a new context is opened for this
+    scrape; context_limit caps how many such contexts run at once. With a
+    session store, the context starts from the stored session and skips login.
+
+    Raises:
+        SRCEIAuthenticationError: If login fails
+        SRCEIResponseError: If the SRCEI pages do not render as expected
+    """
+    session = session_store.get() if session_store else None
+    async with context_limit or nullcontext():
+        async with SRCEIPlaywrightClient(
+            config,
+            headless=True,
+            browser=await browser.get() if browser else None,
+            session=session,
+        ) as client:
+            await authenticate(client, session_store)
+            with invalidate_session_on_error(client, session_store):
+                async for slot in client.iter_slots(procedure_id, region_id):
+                    yield slot
+
+
+async def iter_slots(
+    config: SRCEIConfig,
+    procedure_id: str,
+    region_id: str,
+    client_type: str = "http",
+    browser: Optional[SharedBrowser] = None,
+    context_limit: Optional[asyncio.Semaphore] = None,
+    session_store: Optional[SessionStore] = None,
+) -> AsyncIterator[dict]:
+    """
+    Yield available slots for a procedure and region as they are scraped.
+
+    The HTTP client is tried first when client_type is "http"; if SRCEI answers
+    with a WAF challenge or a login or slots response the HTTP client does not
+    recognise, the Playwright client is used instead. Rejected credentials
+    are not retried.
+
+    Args:
+        config: SRCEIConfig instance with credentials
+        procedure_id: Procedure type ID
+        region_id: Region ID
+        client_type: "http" or "playwright"
+        browser: Shared browser for the Playwright client
+        context_limit: Semaphore capping concurrent browser contexts
+        session_store: Store for the authenticated Playwright session
+
+    Yields:
+        Unique slot dictionaries, in scrape order
+
+    Raises:
+        SRCEIAuthenticationError: If login fails
+    """
+    if client_type == "http":
+        try:
+            # The HTTP client fetches all slots in one response, so fallback
+            # errors are always raised before the first slot is yielded
+            async for slot in iter_with_http(config, procedure_id, region_id):
+                yield slot
+            return
+        except FALLBACK_ERRORS as e:
+            logger.warning(f"{e}, falling back to Playwright")
+
+    async for slot in iter_with_playwright(
+        config,
+        procedure_id,
+        region_id,
+        browser=browser,
+        context_limit=context_limit,
+        session_store=session_store,
+    ):
+        yield slot
+
+
+async def scrape_slots(
+    config: SRCEIConfig,
+    procedure_id: str,
+    region_id: str,
+    client_type: str = "http",
+    browser: Optional[SharedBrowser] = None,
+    context_limit: Optional[asyncio.Semaphore] = None,
+    session_store: Optional[SessionStore] = None,
+) -> list[dict]:
+    """
+    Scrape available slots for a procedure and region.
+
+    See iter_slots for the arguments.
+
+    Returns:
+        List of unique slot dictionaries
+
+    Raises:
+        SRCEIAuthenticationError: If login fails
+    """
+    return [
+        slot
+        async for slot in iter_slots(
+            config,
+            procedure_id,
+            region_id,
+            client_type=client_type,
+            browser=browser,
+            context_limit=context_limit,
+            session_store=session_store,
+        )
+    ]
+
+
+async def scrape_many_with_http(
+    config: SRCEIConfig, queries: list[tuple[str, str]]
+) -> list[list[dict] | BaseException]:
+    """
+    Scrape several (procedure, region) pairs concurrently over one HTTP session.
+
+    Raises:
+        SRCEIAuthenticationError: If SRCEI rejects the credentials
+        SRCEIWAFChallengeError: If the WAF rejects the login
+        SRCEIResponseError: If the login response cannot be parsed
+    """
+    batch_limit = asyncio.Semaphore(BATCH_MAX_PARALLEL)
+
+    async with SRCEIHttpClient(config) as client:
+        if not await client.login():
+            raise SRCEIAuthenticationError("Failed to authenticate with SRCEI")
+
+        async def scrape_one(procedure_id: str, region_id: str) -> list[dict]:
+            async with batch_limit:
+                return await client.get_slots_by_region(procedure_id, region_id)
+
+        return await asyncio.gather(*[scrape_one(p, r) for p, r in queries], return_exceptions=True)
+
+
+async def scrape_many_with_playwright(
+    config: SRCEIConfig,
+    queries: list[tuple[str, str]],
+    browser: Optional[SharedBrowser] = None,
+    context_limit: Optional[asyncio.Semaphore] = None,
+    session_store: Optional[SessionStore] = None,
+) -> list[list[dict] | BaseException]:
+    """
+    Scrape several (procedure, region) pairs concurrently in one browser.
+
+    Each pair gets its own context opened from the stored session, so at most
+    one login happens for the whole batch. Without a session store, a store
+    local to the batch is used. If no shared browser is given, one is
+    launched for the duration of the batch.
+
+    Raises:
+        SRCEIAuthenticationError: If login fails
+    """
+    if browser is None:
+        async with SharedBrowser() as browser:
+            return await scrape_many_with_playwright(
+                config,
+                queries,
+                browser=browser,
+                context_limit=context_limit,
+                session_store=session_store,
+            )
+
+    session_store = session_store or SessionStore()
+    batch_limit = asyncio.Semaphore(BATCH_MAX_PARALLEL)
+
+    async def scrape_one(procedure_id: str, region_id: str) -> list[dict]:
+        async with batch_limit, context_limit or nullcontext():
+            async with SRCEIPlaywrightClient(
+                config, browser=await browser.get(), session=session_store.get()
+            ) as client:
+                await authenticate(client, session_store)
+                with invalidate_session_on_error(client, session_store):
+                    return await client.get_slots_by_region(procedure_id, region_id)
+
+    results = await asyncio.gather(*[scrape_one(p, r) for p, r in queries], return_exceptions=True)
+    # A failed login fails every pair; surface it like the single-pair scrape does
+    if results and all(isinstance(r, SRCEIAuthenticationError) for r in results):
+        raise results[0]
+    return results
+
+
+async def scrape_many(
+    config: SRCEIConfig,
+    queries: list[tuple[str, str]],
+    client_type: str = "http",
+    browser: Optional[SharedBrowser] = None,
+    context_limit: Optional[asyncio.Semaphore] = None,
+    session_store: Optional[SessionStore] = None,
+) -> list[list[dict] | BaseException]:
+    """
+    Scrape several (procedure, region) pairs concurrently, logging in once.
+
+    With client_type "http", pairs rejected by the WAF or answered with an
+    unparseable response (or all of them, if the login is rejected by the WAF
+    or unrecognised) are retried with Playwright.
+
+    Args:
+        config: SRCEIConfig instance with credentials
+        queries: (procedure_id, region_id) pairs
+        client_type: "http" or "playwright"
+        browser: Shared browser for the Playwright client
+        context_limit: Semaphore capping concurrent browser contexts
+        session_store: Store for the authenticated Playwright session
+
+    Returns:
+        One entry per query, in order: its slot list, or the exception it raised
+
+    Raises:
+        SRCEIAuthenticationError: If login fails
+    """
+    if client_type == "http":
+        try:
+            results = await scrape_many_with_http(config, queries)
+        except FALLBACK_ERRORS as e:
+            logger.warning(f"{e}, falling back to Playwright")
+        else:
+            rejected = [i for i, r in enumerate(results) if isinstance(r, FALLBACK_ERRORS)]
+            if rejected:
+                logger.warning(f"{len(rejected)} HTTP queries failed, retrying with Playwright")
+                retried = await scrape_many_with_playwright(
+                    config,
+                    [queries[i] for i in rejected],
+                    browser=browser,
+                    context_limit=context_limit,
+                    session_store=session_store,
+                )
+                for i, result in zip(rejected, retried):
+                    results[i] = result
+            return results
+
+    return await scrape_many_with_playwright(
+        config,
+        queries,
+        browser=browser,
+        context_limit=context_limit,
+        session_store=session_store,
+    )
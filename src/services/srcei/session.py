@@ -0,0 +1,48 @@
+"""In-process store for the authenticated SRCEI browser session."""
+
+import asyncio
+import time
+from typing import Optional
+
+from .client import SRCEISession
+
+# SRCEI session cookies outlive a single scrape by far; refresh well before they expire
+SESSION_TTL = 30 * 60  # seconds
+
+
+class SessionStore:
+    """
+    Holds the last exported SRCEISession so scrapes can skip login.
+
+    The storage state includes SRCEI session cookies, so it is kept in process
+    memory only. `lock` serializes re-logins when the stored session expires.
+    """
+
+    def __init__(self, ttl: int = SESSION_TTL):
+        """
+        Initialize session store.
+
+        Args:
+            ttl: Seconds a stored session is reused before forcing a new login
+        """
+        self.ttl = ttl
+        self.lock = asyncio.Lock()
+
+        self._session: Optional[SRCEISession] = None
+        self._expires_at = 0.0
+
+    def get(self) -> Optional[SRCEISession]:
+        """Get the stored session, or None if there is none or it has expired."""
+        if self._session and time.monotonic() < self._expires_at:
+            return self._session
+        return None
+
+    def set(self, session: SRCEISession) -> None:
+        """Store a freshly exported session."""
+        self._session = session
+        self._expires_at = time.monotonic() + self.ttl
+
+    def invalidate(self, session: SRCEISession) -> None:
+        """Drop the stored session if it is still the given (expired) one."""
+        if self._session is session:
+            self._session = None
@@ -1,18 +1,231 @@
 """Tests for slots API."""
 
+import asyncio
+
+import httpx
+import orjson
 import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
 
+from src.api.dependencies import get_scrape_limit, get_slot_cache
 from src.api.main import app
+from src.api.middleware.profiling import profile_request
+from src.api.responses import ClosingStreamingResponse
+from src.api.routers import slots as slots_router
+from src.services.cache import SlotCache
+from src.services.srcei import client as srcei_client
+from src.services.srcei import scraper
+from src.services.srcei.client import SharedBrowser, SRCEIPlaywrightClient, SRCEISession
+from src.services.srcei.config import SRCEIConfig
+from src.services.srcei.exceptions import (
+    SRCEIAuthenticationError,
+    SRCEIResponseError,
+    SRCEIWAFChallengeError,
+)
+from src.services.srcei.http_client import SRCEIHttpClient, parse_slots_html
 from src.services.srcei.recommender import (
+    dedupe_slots,
     format_slot_datetime,
     format_slot_datetime_iso,
     parse_slot_date,
     sort_slots_by_datetime,
+    sort_slots_with_iso,
 )
+from src.services.srcei.session import SessionStore
 
 client = TestClient(app)
 
+config = SRCEIConfig(rut="12345678-9", password="secret")
+
+LOGIN_PAGE = '<form action="login.srcei"><input name="run"><input name="pass"></form>'
+
+SLOT = {
+    "nombreOficina": "SANTIAGO CENTRO",
+    "direccionOficina": "TEATINOS 120",
+    "fechaDisponible": "29/01/2026",
+    "horaDisponible": "09:30",
+}
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio commands SlotCache uses (no expiry)."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    async def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == token.encode():
+            del self.data[key]
+            return 1
+        return 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Pipeline for FakeRedis that runs the queued SET commands on execute()."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def set(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+    async def execute(self):
+        return [await self.redis.set(*args, **kwargs) for args, kwargs in self.commands]
+
+
+@pytest.fixture
+def fake_redis():
+    """Serve GET /slots through a SlotCache backed by FakeRedis."""
+    redis = FakeRedis()
+    app.dependency_overrides[get_slot_cache] = lambda: SlotCache(redis)
+    yield redis
+    app.dependency_overrides.pop(get_slot_cache)
+
+
+@pytest.fixture
+def scrape_limit():
+    """Route every slots endpoint through one shared single-slot scrape limit."""
+    limit = asyncio.Semaphore(1)
+    app.dependency_overrides[get_scrape_limit] = lambda: limit
+    yield limit
+    app.dependency_overrides.pop(get_scrape_limit)
+
+
+def mock_scrape(monkeypatch, result=None, error=None):
+    """Replace the router's scrape with a stub; returns the list of calls made."""
+    calls = []
+
+    async def scrape_slots(*args, **kwargs):
+        calls.append(args)
+        if error:
+            raise error
+        return result if result is not None else [SLOT]
+
+    monkeypatch.setattr(slots_router, "scrape_slots", scrape_slots)
+    return calls
+
+
+def mock_stream(monkeypatch, slots=(), error=None):
+    """Replace the router's slot iterator with a stub; returns its state."""
+    state = {"closed": False}
+
+    async def iter_slots(*args, **kwargs):
+        try:
+            if error:
+                raise error
+            for slot in slots:
+                yield slot
+        finally:
+            state["closed"] = True
+
+    monkeypatch.setattr(slots_router, "iter_slots", iter_slots)
+    return state
+
+
+class StubPlaywrightClient:
+    """Stand-in for SRCEIPlaywrightClient that fails for region "99"."""
+
+    def __init__(self, config, browser=None, session=None, **kwargs):
+        self.session = session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def get_slots_by_region(self, procedure_id, region_id):
+        if region_id == "99":
+            raise SRCEIResponseError("Slots page did not render")
+        return [dict(SLOT, idOficina=region_id)]
+
+    async def iter_slots(self, procedure_id, region_id):
+        for slot in await self.get_slots_by_region(procedure_id, region_id):
+            yield slot
+
+
+class StubSessionClient:
+    """Stand-in for SRCEIPlaywrightClient's session handling in authenticate()."""
+
+    def __init__(self, session=None, session_valid=False, login_ok=True):
+        self.session = session
+        self.session_valid = session_valid
+        self.login_ok = login_ok
+        self.logins = 0
+        self.adopted = None
+
+    async def resume_session(self):
+        return self.session_valid
+
+    async def adopt_session(self, session):
+        self.adopted = session
+        return True
+
+    async def login(self):
+        await asyncio.sleep(0.01)
+        self.logins += 1
+        return self.login_ok
+
+    async def export_session(self):
+        return SRCEISession(storage_state={"cookies": []}, selection_url="https://example.com")
+
+
+class StubBrowser:
+    """Stand-in for SharedBrowser."""
+
+    async def get(self):
+        return None
+
+
+def mock_srcei(
+    monkeypatch,
+    login_ok: bool = True,
+    slots: httpx.Response | None = None,
+    login: httpx.Response | None = None,
+    login_page: httpx.Response | None = None,
+):
+    """Route SRCEIHttpClient through an httpx.MockTransport emulating SRCEI."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/web/init.srcei"):
+            return login_page or httpx.Response(200, text=LOGIN_PAGE)
+        if request.url.path.endswith("/login.srcei"):
+            if login:
+                return login
+            if login_ok:
+                return httpx.Response(200, text="<h1>Reserva de Hora</h1>")
+            return httpx.Response(200, text=f"<h1>Reserva de Hora</h1>{LOGIN_PAGE}")
+        return slots or httpx.Response(404)
+
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.config.base_url, transport=httpx.MockTransport(handler)
+        )
+
+    monkeypatch.setattr(SRCEIHttpClient, "start", start)
+
 
 def test_read_root():
     """Test root endpoint."""
@@ -23,6 +236,70 @@ def test_read_root():
     assert data["status"] == "healthy"
 
 
+def test_profile_ignored_by_default():
+    """Test that ?profile=1 is ignored unless profiling is enabled."""
+    response = client.get("/?profile=1")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+
+
+def test_metrics():
+    """Test Prometheus metrics endpoint."""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "inflight_scrapes" in response.text
+
+
+def test_profile_streaming_response():
+    """Test that profiling drains a streaming response before reporting."""
+    pytest.importorskip("pyinstrument")
+    sent = []
+
+    async def body():
+        for chunk in (b"a", b"b"):
+            await asyncio.sleep(0.01)
+            sent.append(chunk)
+            yield chunk
+
+    profiled = FastAPI()
+    profiled.middleware("http")(profile_request)
+    profiled.get("/stream")(lambda: StreamingResponse(body()))
+
+    response = TestClient(profiled).get("/stream?profile=1")
+    assert response.status_code == 200
+    assert "text/html" in response.headers["content-type"]
+    assert sent == [b"a", b"b"]
+
+
+def test_profile_stops_on_error(monkeypatch):
+    """Test that the profiler is stopped when the profiled request fails."""
+    pyinstrument = pytest.importorskip("pyinstrument")
+    stopped = []
+
+    class FakeProfiler:
+        def __init__(self, **kwargs):
+            pass
+
+        def start(self):
+            pass
+
+        def stop(self):
+            stopped.append(True)
+
+    monkeypatch.setattr(pyinstrument, "Profiler", FakeProfiler)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    profiled = FastAPI()
+    profiled.middleware("http")(profile_request)
+    profiled.get("/fail")(fail)
+
+    with pytest.raises(RuntimeError):
+        TestClient(profiled).get("/fail?profile=1")
+    assert stopped == [True]
+
+
 def test_get_slots_missing_params():
     """Test slots endpoint with missing parameters."""
     response = client.get("/slots")
@@ -41,6 +318,42 @@ def test_get_slots_invalid_region():
     assert response.status_code == 422  # Validation error
 
 
+def test_stream_slots_invalid_region():
+    """Test streaming slots endpoint with invalid region_id."""
+    response = client.get("/slots/stream?procedure_id=6&region_id=99")
+    assert response.status_code == 422  # Validation error
+
+
+def test_stream_slots(monkeypatch):
+    """Test NDJSON streaming of slots after a header line."""
+    state = mock_stream(monkeypatch, slots=[SLOT, SLOT])
+    response = client.get("/slots/stream?procedure_id=6&region_id=13")
+    assert response.status_code == 200
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["procedure_id"] == "6"
+    assert [line["datetime_iso"] for line in lines[1:]] == ["2026-01-29T09:30:00"] * 2
+    assert state["closed"]
+
+
+def test_stream_slots_error(monkeypatch):
+    """Test that a scrape error before the first slot maps to a 500."""
+    mock_stream(monkeypatch, error=RuntimeError("SRCEI down"))
+    response = client.get("/slots/stream?procedure_id=6&region_id=13")
+    assert response.status_code == 500
+
+
+def test_get_slots_batch_invalid_query():
+    """Test batch slots endpoint with an invalid procedure_id."""
+    response = client.post("/slots/batch", json=[{"procedure_id": "99", "region_id": "13"}])
+    assert response.status_code == 422  # Validation error
+
+
+def test_get_slots_batch_empty():
+    """Test batch slots endpoint with no queries."""
+    response = client.post("/slots/batch", json=[])
+    assert response.status_code == 422  # Validation error
+
+
 def test_parse_slot_date():
     """Test date parsing."""
     assert parse_slot_date("29/01/2026") == "2026-01-29"
@@ -58,6 +371,8 @@ def test_format_slot_datetime_iso():
     """Test ISO datetime formatting."""
     slot = {"fechaDisponible": "29/01/2026", "horaDisponible": "09:30"}
     assert format_slot_datetime_iso(slot) == "2026-01-29T09:30:00"
+    slot = {"fechaDisponible": "5/3/2026", "horaDisponible": "09:30"}
+    assert format_slot_datetime_iso(slot) == "2026-03-05T09:30:00"
 
 
 def test_sort_slots_by_datetime():
@@ -73,6 +388,17 @@ def test_sort_slots_by_datetime():
     assert sorted_slots[2]["nombreOficina"] == "B"  # 30/01 10:00
 
 
+def test_sort_slots_with_iso():
+    """Test slot sorting with precomputed ISO datetimes."""
+    slots = [
+        {"fechaDisponible": "01/02/2026", "horaDisponible": "08:00", "nombreOficina": "B"},
+        {"fechaDisponible": "31/01/2026", "horaDisponible": "17:45", "nombreOficina": "A"},
+    ]
+    sorted_slots = sort_slots_with_iso(slots)
+    assert [slot["nombreOficina"] for _, slot in sorted_slots] == ["A", "B"]
+    assert sorted_slots[0][0] == "2026-01-31T17:45:00"
+
+
 @pytest.mark.asyncio
 @pytest.mark.integration
 async def test_get_slots_integration():
@@ -93,3 +419,604 @@ async def test_get_slots_integration():
     assert data["procedure_id"] == "6"
     assert data["region_id"] == "13"
     assert isinstance(data["slots"], list)
+
+
+def test_dedupe_slots():
+    """Test duplicate slot removal."""
+    slot = {"nombreOficina": "A", "fechaDisponible": "29/01/2026", "horaDisponible": "09:30"}
+    other = {"nombreOficina": "B", "fechaDisponible": "29/01/2026", "horaDisponible": "09:30"}
+    assert dedupe_slots([slot, dict(slot), other]) == [slot, other]
+
+    # Fields containing the old "_" separator must not collide
+    a = {"nombreOficina": "A_B", "fechaDisponible": "C", "horaDisponible": "D"}
+    b = {"nombreOficina": "A", "fechaDisponible": "B_C", "horaDisponible": "D"}
+    assert dedupe_slots([a, b]) == [a, b]
+
+
+def test_parse_slots_html():
+    """Test slot extraction from SRCEI HTML."""
+    html = """
+    <div class="card">
+        <p>SANTIAGO CENTRO</p><p>TEATINOS 120</p>
+        <span>5</span><span>Marzo</span><span>09:30</span>
+        <button>Agendar</button>
+    </div>
+    <div class="card"><p>SIN HORAS</p></div>
+    """
+    slots = dedupe_slots(parse_slots_html(html))
+    assert len(slots) == 1
+    assert slots[0]["nombreOficina"] == "SANTIAGO CENTRO"
+    assert slots[0]["direccionOficina"] == "TEATINOS 120"
+    assert slots[0]["fechaDisponible"].startswith("05/03/")
+    assert slots[0]["horaDisponible"] == "09:30"
+
+
+def test_session_store():
+    """Test stored session reuse, expiry and invalidation."""
+    session = SRCEISession(storage_state={"cookies": []}, selection_url="https://example.com")
+
+    store = SessionStore()
+    assert store.get() is None
+    store.set(session)
+    assert store.get() is session
+    store.invalidate(session)
+    assert store.get() is None
+
+    expired = SessionStore(ttl=0)
+    expired.set(session)
+    assert expired.get() is None
+
+
+@pytest.mark.asyncio
+async def test_http_login_rejected(monkeypatch):
+    """Test that a re-rendered login form is reported as a failed login."""
+    mock_srcei(monkeypatch, login_ok=False)
+    async with SRCEIHttpClient(config) as http:
+        assert await http.login() is False
+        assert not http.is_authenticated
+
+
+@pytest.mark.asyncio
+async def test_http_slots_json(monkeypatch):
+    """Test slots returned as JSON by the HTTP client."""
+    mock_srcei(monkeypatch, slots=httpx.Response(200, json=[SLOT, SLOT]))
+    async with SRCEIHttpClient(config) as http:
+        assert await http.login()
+        assert await http.get_slots_by_region("6", "13") == [SLOT]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "slots",
+    [
+        httpx.Response(404),
+        httpx.Response(200, json={"horas": [SLOT]}),
+        httpx.Response(200, text="<html><body>Error</body></html>"),
+    ],
+)
+async def test_http_slots_unexpected_response(monkeypatch, slots):
+    """Test that unparseable slot responses raise instead of returning no slots."""
+    mock_srcei(monkeypatch, slots=slots)
+    async with SRCEIHttpClient(config) as http:
+        assert await http.login()
+        with pytest.raises(SRCEIResponseError):
+            await http.get_slots_by_region("6", "13")
+
+
+@pytest.mark.asyncio
+async def test_http_slots_none_available(monkeypatch):
+    """Test that the no-slots page yields an empty list."""
+    mock_srcei(monkeypatch, slots=httpx.Response(200, text="<p>No hay horas disponibles</p>"))
+    async with SRCEIHttpClient(config) as http:
+        assert await http.login()
+        assert await http.get_slots_by_region("6", "13") == []
+
+
+@pytest.mark.asyncio
+async def test_scrape_slots_falls_back_on_bad_response(monkeypatch):
+    """Test that an unparseable HTTP slots response falls back to Playwright."""
+    mock_srcei(monkeypatch)
+
+    async def iter_with_playwright(*args, **kwargs):
+        yield SLOT
+
+    monkeypatch.setattr(scraper, "iter_with_playwright", iter_with_playwright)
+    assert await scraper.scrape_slots(config, "6", "13") == [SLOT]
+
+
+@pytest.mark.asyncio
+async def test_shared_browser_relaunch(monkeypatch):
+    """Test that the shared browser is launched lazily and relaunched after a crash."""
+
+    class FakeBrowser:
+        connected = True
+
+        def is_connected(self):
+            return self.connected
+
+        async def close(self):
+            self.connected = False
+
+    class FakePlaywright:
+        async def start(self):
+            return self
+
+        async def stop(self):
+            pass
+
+    async def launch_browser(playwright, headless=True):
+        launched.append(FakeBrowser())
+        return launched[-1]
+
+    launched = []
+    monkeypatch.setattr(srcei_client, "async_playwright", FakePlaywright)
+    monkeypatch.setattr(srcei_client, "launch_browser", launch_browser)
+
+    async with SharedBrowser() as browser:
+        assert launched == []
+        first = await browser.get()
+        assert await browser.get() is first
+
+        first.connected = False  # Browser process died
+        second = await browser.get()
+        assert second is not first
+        assert len(launched) == 2
+    assert not second.connected
+
+
+@pytest.mark.asyncio
+async def test_slot_cache_lock():
+    """Test that only one holder gets the cache lock until it is released."""
+    cache = SlotCache(FakeRedis())
+    async with cache.lock("6", "13") as first:
+        async with cache.lock("6", "13") as second:
+            assert first is True
+            assert second is False
+    async with cache.lock("6", "13") as again:
+        assert again is True
+
+
+@pytest.mark.asyncio
+async def test_slot_cache_wait_for():
+    """Test waiting for a value written by another request."""
+    cache = SlotCache(FakeRedis())
+
+    async def write_later():
+        await asyncio.sleep(0.05)
+        await cache.set("6", "13", b"[]")
+
+    writer = asyncio.create_task(write_later())
+    assert await cache.wait_for("6", "13", timeout=1, interval=0.01) == b"[]"
+    await writer
+    assert await cache.wait_for("7", "13", timeout=0.05, interval=0.01) is None
+
+
+def test_get_slots_cache_miss_then_hit(monkeypatch, fake_redis):
+    """Test that a cache miss scrapes once and the next request is a hit."""
+    calls = mock_scrape(monkeypatch)
+
+    response = client.get("/slots?procedure_id=6&region_id=13")
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "miss"
+    assert response.json()["count"] == 1
+
+    response = client.get("/slots?procedure_id=6&region_id=13")
+    assert response.headers["X-Cache"] == "hit"
+    assert response.json()["count"] == 1
+    assert len(calls) == 1
+
+
+def test_get_slots_serves_stale_on_failure(monkeypatch, fake_redis):
+    """Test that a failed scrape serves the stale copy instead of an error."""
+    fake_redis.data["slots:6:13:stale"] = orjson.dumps({"count": 1})
+    mock_scrape(monkeypatch, error=RuntimeError("SRCEI down"))
+
+    response = client.get("/slots?procedure_id=6&region_id=13")
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "stale"
+    assert response.json() == {"count": 1}
+
+
+def test_get_slots_failure_without_stale(monkeypatch, fake_redis):
+    """Test that a failed scrape with nothing cached is an error."""
+    mock_scrape(monkeypatch, error=RuntimeError("SRCEI down"))
+
+    response = client.get("/slots?procedure_id=6&region_id=13")
+    assert response.status_code == 500
+
+
+def test_get_slots_empty_result_keeps_stale(monkeypatch, fake_redis):
+    """Test that an empty scrape result does not replace the stale copy."""
+    stale = orjson.dumps({"count": 1})
+    fake_redis.data["slots:6:13:stale"] = stale
+    mock_scrape(monkeypatch, result=[])
+
+    response = client.get("/slots?procedure_id=6&region_id=13")
+    assert response.headers["X-Cache"] == "miss"
+    assert response.json()["count"] == 0
+    assert fake_redis.data["slots:6:13:stale"] == stale
+
+
+def test_get_slots_lock_held_elsewhere(monkeypatch, fake_redis):
+    """Test that a request scrapes itself when another holder never fills the cache."""
+    fake_redis.data["slots:6:13:lock"] = b"other"
+    monkeypatch.setattr(slots_router, "CACHE_LOCK_WAIT", 0.3)
+    calls = mock_scrape(monkeypatch)
+
+    response = client.get("/slots?procedure_id=6&region_id=13")
+    assert response.headers["X-Cache"] == "miss"
+    assert len(calls) == 1
+    # The other holder's lock is left alone
+    assert fake_redis.data["slots:6:13:lock"] == b"other"
+
+
+@pytest.mark.asyncio
+async def test_scrape_many_with_playwright_partial_failure(monkeypatch):
+    """Test that one failing pair does not fail the rest of the batch."""
+
+    async def authenticate(client, session_store=None):
+        pass
+
+    monkeypatch.setattr(scraper, "SRCEIPlaywrightClient", StubPlaywrightClient)
+    monkeypatch.setattr(scraper, "authenticate", authenticate)
+
+    results = await scraper.scrape_many_with_playwright(
+        config, [("6", "13"), ("6", "99"), ("6", "5")], browser=StubBrowser()
+    )
+    assert results[0][0]["idOficina"] == "13"
+    assert isinstance(results[1], SRCEIResponseError)
+    assert results[2][0]["idOficina"] == "5"
+
+
+@pytest.mark.asyncio
+async def test_scrape_many_retries_failed_http_pairs(monkeypatch):
+    """Test that only the pairs the HTTP client failed are retried with Playwright."""
+    waf, bad = SRCEIWAFChallengeError("rejected"), SRCEIResponseError("bad")
+    other = ValueError("unrelated")
+    retried = []
+
+    async def scrape_many_with_http(config, queries):
+        return [[SLOT], waf, bad, other]
+
+    async def scrape_many_with_playwright(config, queries, **kwargs):
+        retried.extend(queries)
+        return [[dict(SLOT, idOficina=r)] for _, r in queries]
+
+    monkeypatch.setattr(scraper, "scrape_many_with_http", scrape_many_with_http)
+    monkeypatch.setattr(scraper, "scrape_many_with_playwright", scrape_many_with_playwright)
+
+    queries = [("6", "1"), ("6", "2"), ("6", "3"), ("6", "4")]
+    results = await scraper.scrape_many(config, queries)
+    assert retried == [("6", "2"), ("6", "3")]
+    assert results[0] == [SLOT]
+    assert results[1][0]["idOficina"] == "2"
+    assert results[2][0]["idOficina"] == "3"
+    assert results[3] is other
+
+
+@pytest.mark.asyncio
+async def test_scrape_many_falls_back_when_http_login_rejected(monkeypatch):
+    """Test that a WAF-rejected HTTP login sends the whole batch to Playwright."""
+
+    async def scrape_many_with_http(config, queries):
+        raise SRCEIWAFChallengeError("rejected")
+
+    async def scrape_many_with_playwright(config, queries, **kwargs):
+        return [[SLOT] for _ in queries]
+
+    monkeypatch.setattr(scraper, "scrape_many_with_http", scrape_many_with_http)
+    monkeypatch.setattr(scraper, "scrape_many_with_playwright", scrape_many_with_playwright)
+
+    assert await scraper.scrape_many(config, [("6", "1"), ("6", "2")]) == [[SLOT], [SLOT]]
+
+
+@pytest.mark.asyncio
+async def test_scrape_many_with_http(monkeypatch):
+    """Test that a batch over one HTTP session reports per-pair failures."""
+    mock_srcei(monkeypatch, slots=httpx.Response(200, json=[SLOT]))
+    assert await scraper.scrape_many_with_http(config, [("6", "13")]) == [[SLOT]]
+
+    mock_srcei(monkeypatch)
+    results = await scraper.scrape_many_with_http(config, [("6", "13"), ("6", "5")])
+    assert all(isinstance(r, SRCEIResponseError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_authenticate_resumes_valid_session():
+    """Test that a still-valid stored session skips login."""
+    session = SRCEISession(storage_state={}, selection_url="https://example.com")
+    store = SessionStore()
+    store.set(session)
+    stub = StubSessionClient(session=session, session_valid=True)
+
+    await scraper.authenticate(stub, store)
+    assert stub.logins == 0
+    assert store.get() is session
+
+
+@pytest.mark.asyncio
+async def test_authenticate_replaces_expired_session():
+    """Test that an expired stored session is invalidated and replaced by a new login."""
+    expired = SRCEISession(storage_state={}, selection_url="https://example.com")
+    store = SessionStore()
+    store.set(expired)
+    stub = StubSessionClient(session=expired)
+
+    await scraper.authenticate(stub, store)
+    assert stub.logins == 1
+    assert stub.adopted is None
+    assert store.get() not in (None, expired)
+
+
+@pytest.mark.asyncio
+async def test_authenticate_logs_in_once_for_concurrent_scrapes():
+    """Test that scrapes sharing an expired session adopt the first one's new login."""
+    expired = SRCEISession(storage_state={}, selection_url="https://example.com")
+    store = SessionStore()
+    store.set(expired)
+    stubs = [StubSessionClient(session=expired) for _ in range(3)]
+
+    await asyncio.gather(*[scraper.authenticate(stub, store) for stub in stubs])
+    assert sum(stub.logins for stub in stubs) == 1
+    fresh = store.get()
+    assert fresh is not expired
+    assert [stub.adopted for stub in stubs if stub.logins == 0] == [fresh, fresh]
+
+
+@pytest.mark.asyncio
+async def test_authenticate_login_failure():
+    """Test that a failed login raises and stores nothing."""
+    store = SessionStore()
+    with pytest.raises(SRCEIAuthenticationError):
+        await scraper.authenticate(StubSessionClient(login_ok=False), store)
+    assert store.get() is None
+
+
+@pytest.mark.asyncio
+async def test_scrape_many_with_playwright_auth_failure(monkeypatch):
+    """Test that a batch raises when every pair fails to authenticate."""
+
+    async def authenticate(client, session_store=None):
+        raise SRCEIAuthenticationError("Failed to authenticate with SRCEI")
+
+    monkeypatch.setattr(scraper, "SRCEIPlaywrightClient", StubPlaywrightClient)
+    monkeypatch.setattr(scraper, "authenticate", authenticate)
+
+    with pytest.raises(SRCEIAuthenticationError):
+        await scraper.scrape_many_with_playwright(
+            config, [("6", "13"), ("6", "5")], browser=StubBrowser()
+        )
+
+
+def test_get_slots_queue_timeout_serves_stale(monkeypatch, fake_redis):
+    """Test that a request queued past SCRAPE_QUEUE_WAIT gets the stale copy."""
+    fake_redis.data["slots:6:13:stale"] = orjson.dumps({"count": 1})
+    # A fresh semaphore per request with no free slots: the queue is full
+    app.dependency_overrides[get_scrape_limit] = lambda: asyncio.Semaphore(0)
+    monkeypatch.setattr(slots_router, "SCRAPE_QUEUE_WAIT", 0.05)
+    calls = mock_scrape(monkeypatch)
+    try:
+        response = client.get("/slots?procedure_id=6&region_id=13")
+    finally:
+        app.dependency_overrides.pop(get_scrape_limit)
+    assert response.headers["X-Cache"] == "stale"
+    assert response.json() == {"count": 1}
+    assert calls == []
+
+
+def test_get_slots_cache_filled_while_queued(monkeypatch, fake_redis, scrape_limit):
+    """Test that a request whose key was cached while it queued serves the cached value."""
+    calls = mock_scrape(monkeypatch)
+
+    async def acquire_scrape_slot(limit, timeout):
+        # Another request finishes the same scrape while this one waits for a slot
+        fake_redis.data["slots:6:13"] = orjson.dumps({"count": 1})
+        await limit.acquire()
+        return True
+
+    monkeypatch.setattr(slots_router, "_acquire_scrape_slot", acquire_scrape_slot)
+
+    response = client.get("/slots?procedure_id=6&region_id=13")
+    assert response.headers["X-Cache"] == "hit"
+    assert calls == []
+    assert not scrape_limit.locked()
+
+
+def test_get_slots_lock_wait_frees_scrape_slot(monkeypatch, fake_redis, scrape_limit):
+    """Test that waiting on another request's scrape does not hold a scrape slot."""
+    fake_redis.data["slots:6:13:lock"] = b"other"
+    calls = mock_scrape(monkeypatch)
+
+    async def wait_for(self, procedure_id, region_id, timeout):
+        assert not scrape_limit.locked()
+        return None
+
+    monkeypatch.setattr(SlotCache, "wait_for", wait_for)
+
+    response = client.get("/slots?procedure_id=6&region_id=13")
+    assert response.headers["X-Cache"] == "miss"
+    assert len(calls) == 1
+    assert not scrape_limit.locked()
+
+
+def test_scrape_limit_released(monkeypatch, scrape_limit):
+    """Test that every slots endpoint takes and releases a scrape slot."""
+    mock_scrape(monkeypatch)
+    state = mock_stream(monkeypatch, slots=[SLOT])
+
+    async def scrape_many(config, queries, **kwargs):
+        assert scrape_limit.locked()
+        return [[SLOT] for _ in queries]
+
+    monkeypatch.setattr(slots_router, "scrape_many", scrape_many)
+
+    assert client.get("/slots?procedure_id=6&region_id=13").status_code == 200
+    assert client.get("/slots/stream?procedure_id=6&region_id=13").status_code == 200
+    assert state["closed"]
+    batch = [{"procedure_id": "6", "region_id": "13"}]
+    assert client.post("/slots/batch", json=batch).status_code == 200
+    assert not scrape_limit.locked()
+
+    mock_stream(monkeypatch, error=RuntimeError("SRCEI down"))
+    assert client.get("/slots/stream?procedure_id=6&region_id=13").status_code == 500
+    assert not scrape_limit.locked()
+
+
+@pytest.mark.asyncio
+async def test_closing_streaming_response_runs_cleanup():
+    """Test that cleanup runs even when the body is never iterated."""
+    closed = []
+
+    async def body():
+        yield b"never sent"
+
+    async def on_close():
+        closed.append(True)
+
+    async def send(message):
+        raise OSError("client went away")
+
+    response = ClosingStreamingResponse(body(), on_close=on_close)
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    with pytest.raises(ClientDisconnect):
+        await response(scope, None, send)
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "login_page, login",
+    [
+        (None, httpx.Response(404)),
+        (None, httpx.Response(500, text="<h1>Reserva de Hora</h1>")),
+        (httpx.Response(200, text="<div id='app'></div>"), None),
+        (httpx.Response(404), None),
+    ],
+)
+async def test_http_login_unexpected_response(monkeypatch, login_page, login):
+    """Test that unrecognised login pages raise instead of reporting bad credentials."""
+    mock_srcei(monkeypatch, login=login, login_page=login_page)
+    async with SRCEIHttpClient(config) as http:
+        with pytest.raises(SRCEIResponseError):
+            await http.login()
+
+
+@pytest.mark.asyncio
+async def test_http_login_transport_error(monkeypatch):
+    """Test that a failed login request raises SRCEIResponseError."""
+
+    def handler(request):
+        raise httpx.ConnectTimeout("timed out", request=request)
+
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.config.base_url, transport=httpx.MockTransport(handler)
+        )
+
+    monkeypatch.setattr(SRCEIHttpClient, "start", start)
+    async with SRCEIHttpClient(config) as http:
+        with pytest.raises(SRCEIResponseError):
+            await http.login()
+
+
+@pytest.mark.asyncio
+async def test_scrape_falls_back_on_unexpected_login(monkeypatch):
+    """Test that single and batch scrapes fall back to Playwright when HTTP login breaks."""
+    mock_srcei(monkeypatch, login=httpx.Response(404))
+
+    async def iter_with_playwright(*args, **kwargs):
+        yield SLOT
+
+    async def scrape_many_with_playwright(config, queries, **kwargs):
+        return [[SLOT] for _ in queries]
+
+    monkeypatch.setattr(scraper, "iter_with_playwright", iter_with_playwright)
+    monkeypatch.setattr(scraper, "scrape_many_with_playwright", scrape_many_with_playwright)
+
+    assert await scraper.scrape_slots(config, "6", "13") == [SLOT]
+    assert await scraper.scrape_many(config, [("6", "13")]) == [[SLOT]]
+
+
+@pytest.mark.asyncio
+async def test_scrape_bad_credentials_not_retried(monkeypatch):
+    """Test that rejected credentials raise without falling back to Playwright."""
+    mock_srcei(monkeypatch, login_ok=False)
+
+    async def iter_with_playwright(*args, **kwargs):
+        raise AssertionError("Playwright should not be used")
+        yield
+
+    monkeypatch.setattr(scraper, "iter_with_playwright", iter_with_playwright)
+    with pytest.raises(SRCEIAuthenticationError):
+        await scraper.scrape_slots(config, "6", "13")
+
+
+class FakePage:
+    """Page showing a fixed URL, title and (optionally) the login form."""
+
+    def __init__(self, url, title="", login_form=False):
+        self.url = url
+        self.login_form = login_form
+        self._title = title
+
+    async def goto(self, url, wait_until=None):
+        pass
+
+    async def title(self):
+        return self._title
+
+    async def query_selector(self, selector):
+        return object() if self.login_form else None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "page, valid",
+    [
+        (FakePage("https://srcei.cl/web/seleccionTramite.srcei"), True),
+        (FakePage("https://srcei.cl/web/inicio.srcei", title="Reserva de Hora"), True),
+        (
+            FakePage("https://srcei.cl/web/init.srcei", title="Reserva de Hora", login_form=True),
+            False,
+        ),
+        (FakePage("https://srcei.cl/web/sesionExpirada.srcei", title="Sesión expirada"), False),
+    ],
+)
+async def test_resume_session(page, valid):
+    """Test that a resumed session is only valid on the selection page."""
+    session = SRCEISession(storage_state={}, selection_url="https://srcei.cl/web/seleccion")
+    pw_client = SRCEIPlaywrightClient(config, session=session)
+    pw_client.page = page
+    assert await pw_client.resume_session() is valid
+    assert pw_client.is_authenticated is valid
+
+
+@pytest.mark.asyncio
+async def test_failed_scrape_invalidates_stored_session(monkeypatch):
+    """Test that a scrape failing after reusing the stored session drops it."""
+
+    async def authenticate(client, session_store=None):
+        pass
+
+    monkeypatch.setattr(scraper, "SRCEIPlaywrightClient", StubPlaywrightClient)
+    monkeypatch.setattr(scraper, "authenticate", authenticate)
+    session = SRCEISession(storage_state={}, selection_url="https://example.com")
+    store = SessionStore()
+
+    store.set(session)
+    await scraper.scrape_many_with_playwright(
+        config, [("6", "13")], browser=StubBrowser(), session_store=store
+    )
+    assert store.get() is session
+
+    await scraper.scrape_many_with_playwright(
+        config, [("6", "99")], browser=StubBrowser(), session_store=store
+    )
+    assert store.get() is None
+
+    store.set(session)
+    with pytest.raises(SRCEIResponseError):
+        await scraper.scrape_slots(
+            config, "6", "99", client_type="playwright", browser=StubBrowser(), session_store=store
+        )
+    assert store.get() is None